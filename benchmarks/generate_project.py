@@ -0,0 +1,153 @@
+"""
+Creates synthetic Publine projects under projects/ for benchmarking. The same arguments always
+produce the same chapters, text and cover, so timings from different runs are comparable.
+
+Usage: python -m benchmarks.generate_project --chapters 1000 [--fragment-size 8000] [--sources 100] [--cover-size 1600x2400]
+"""
+import os
+import json
+import random
+import shutil
+import importlib.util
+import argparse
+from core.src.defaults import DEFAULT_CSS
+from core.src.social_utils import initialize_links
+from web.src.manage_projects import get_project_path
+
+WORDS = (
+    "the of and to in was he she it that with as his her on at by had for not but from they "
+    "were which this all when there been one said would what could into more then them time "
+    "night light door river stone window garden letter morning silence shadow voice hand road "
+    "slowly quietly again already almost never always before after under between across"
+).split()
+
+DEFAULT_FRAGMENT_SIZE = 8000 # Bytes of HTML per chapter, about a 1,300-word chapter
+DEFAULT_SOURCES = 100 # Chapters that also get an import source (.docx, or .txt without python-docx)
+DEFAULT_COVER_SIZE = (1600, 2400)
+VOLUME_SIZE = 100 # Chapters per volume, so paged and volume TOC modes have something to split
+
+def project_slug(chapter_count):
+    return f"bench-{chapter_count}"
+
+def _sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    if rng.random() < 0.2:
+        i = rng.randrange(len(words))
+        words[i] = f"<em>{words[i]}</em>"
+    return " ".join(words).capitalize() + "."
+
+def _paragraphs(rng, size):
+    """Plain-text paragraphs totalling roughly size characters."""
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = " ".join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 8
+    return paragraphs
+
+def _write_docx(path, title, paragraphs):
+    from docx import Document
+    doc = Document()
+    doc.add_heading(title, level=2)
+    for paragraph in paragraphs:
+        doc.add_paragraph(paragraph.replace("<em>", "").replace("</em>", ""))
+    doc.save(path)
+
+def _write_cover(path, size, rng):
+    """Writes a noisy JPEG cover, so it compresses (and resizes) like a real photo, or returns False without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    width, height = size
+    noise = Image.frombytes("L", (width // 8, height // 8), rng.randbytes((width // 8) * (height // 8)))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    cover = Image.merge("RGB", (gradient, noise.resize((width, height)), gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+    cover.save(path, "JPEG", quality=90)
+    return True
+
+def generate_project(chapter_count, fragment_size=DEFAULT_FRAGMENT_SIZE, sources=DEFAULT_SOURCES,
+                     cover_size=DEFAULT_COVER_SIZE, seed=0, slug=None):
+    """
+    Creates (or recreates) projects/<slug> with chapter_count chapters of about fragment_size
+    bytes each, import sources for the first `sources` chapters under sources/, and a cover of
+    cover_size pixels (None for no cover). Returns the project path.
+    """
+    rng = random.Random(f"{seed}-{chapter_count}-{fragment_size}")
+    project_path = get_project_path(slug or project_slug(chapter_count))
+    shutil.rmtree(project_path, ignore_errors=True)
+    data_dir = os.path.join(project_path, "data")
+    includes_dir = os.path.join(project_path, "includes")
+    sources_dir = os.path.join(project_path, "sources")
+    for path in (data_dir, includes_dir, os.path.join(project_path, "public"), sources_dir):
+        os.makedirs(path, exist_ok=True)
+    initialize_links(project_path)
+
+    source_format = "docx" if importlib.util.find_spec("docx") else "txt"
+    if sources and source_format == "txt":
+        print("⚠️ python-docx is not installed; writing .txt import sources instead.")
+
+    cover_image = ""
+    if cover_size and _write_cover(os.path.join(includes_dir, "cover.jpg"), cover_size, rng):
+        cover_image = "cover.jpg"
+
+    chapters = []
+    for number in range(1, chapter_count + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(3)).title()
+        paragraphs = _paragraphs(rng, fragment_size)
+        with open(os.path.join(includes_dir, f"chapter_{number}.html"), "w", encoding="utf-8") as f:
+            f.write("\n".join(f"<p>{paragraph}</p>" for paragraph in paragraphs) + "\n")
+        if number <= sources:
+            source_path = os.path.join(sources_dir, f"chapter_{number}.{source_format}")
+            if source_format == "docx":
+                _write_docx(source_path, title, paragraphs)
+            else:
+                with open(source_path, "w", encoding="utf-8") as f:
+                    f.write("\n\n".join(paragraph.replace("<em>", "").replace("</em>", "") for paragraph in paragraphs))
+        chapters.append({
+            "number": number,
+            "title": title,
+            "discussion": "",
+            "import_source": f"includes/chapter_{number}.html",
+            "import_format": "html",
+            "exclude_from_epub": False,
+            "exclude_from_pdf": False,
+            "draft": False,
+            "volume": f"Volume {(number - 1) // VOLUME_SIZE + 1}",
+        })
+
+    prefs = {
+        "story_title": f"Benchmark {chapter_count}",
+        "story_author": "Publine Benchmarks",
+        "copyright": "2025",
+        "cover_image": cover_image,
+        "pdf_enabled": True,
+        "display_features": {"use_chapter_titles": True, "epub_link": True, "pdf_link": True},
+    }
+    with open(os.path.join(data_dir, "prefs.json"), "w", encoding="utf-8") as f:
+        json.dump(prefs, f, indent=4)
+    with open(os.path.join(data_dir, "chapters.json"), "w", encoding="utf-8") as f:
+        json.dump(chapters, f, indent=4)
+    with open(os.path.join(includes_dir, "styles.css"), "w", encoding="utf-8") as f:
+        f.write(DEFAULT_CSS)
+    return project_path
+
+def parse_size(value):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chapters", "-c", type=int, default=10, help="Number of chapters")
+    parser.add_argument("--fragment-size", type=int, default=DEFAULT_FRAGMENT_SIZE, help="Approximate bytes of HTML per chapter")
+    parser.add_argument("--sources", type=int, default=DEFAULT_SOURCES, help="Chapters that get an import source under sources/")
+    parser.add_argument("--cover-size", type=parse_size, default=DEFAULT_COVER_SIZE, help="Cover size as WIDTHxHEIGHT")
+    parser.add_argument("--no-cover", action="store_true", help="Create the project without a cover image")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated text")
+    parser.add_argument("--slug", help="Project slug (default: bench-<chapters>)")
+    args = parser.parse_args()
+
+    path = generate_project(args.chapters, args.fragment_size, args.sources,
+                            None if args.no_cover else args.cover_size, args.seed, args.slug)
+    print(f"✅ Created {path}")
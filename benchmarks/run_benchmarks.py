@@ -0,0 +1,198 @@
+"""
+Times the publish pipeline on synthetic projects (see generate_project.py) and writes the results
+to benchmarks/results/<timestamp>.json, so runs can be compared over time.
+
+Usage: python -m benchmarks.run_benchmarks [--sizes 10 1000 10000] [--only build_html build_epub] [--baseline results/earlier.json]
+"""
+import io
+import os
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from core.src.utils import load_prefs
+from core.src.importer import import_content
+from web.src.chapter_utils import list_chapters
+from web.src.html_output import build_html
+from web.src.epub_output import build_epub
+from web.src.pdf_output import build_pdf
+from benchmarks.generate_project import generate_project, DEFAULT_FRAGMENT_SIZE, DEFAULT_SOURCES, DEFAULT_COVER_SIZE
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (10, 1000, 10000)
+BENCHMARKS = (
+    "list_chapters", "import_content",
+    "build_html (cold)", "build_html (forced)", "build_html (incremental)",
+    "build_epub", "build_pdf"
+)
+# WeasyPrint lays the whole book out in memory; beyond this many chapters a PDF run takes hours
+DEFAULT_PDF_LIMIT = 1000
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _time(func, setup=None, repeat=1):
+    """
+    Runs func repeat times with its console output discarded, calling setup (untimed) before
+    each run. Returns the timings in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    return timings
+
+def _expect_output(path):
+    # The EPUB and PDF builders log failures (such as WeasyPrint missing) and return None
+    if path is None:
+        raise RuntimeError("no output was produced; see the log above")
+
+def _clear_build_state(project_path):
+    """Removes everything earlier builds left behind: output, releases, caches and the manifest."""
+    for name in ("public", "releases", "cache"):
+        shutil.rmtree(os.path.join(project_path, name), ignore_errors=True)
+    for name in ("build_manifest.json", "build_profile.json"):
+        if os.path.exists(os.path.join(project_path, "data", name)):
+            os.remove(os.path.join(project_path, "data", name))
+
+def _import_sources(project_path):
+    sources_dir = os.path.join(project_path, "sources")
+    for name in sorted(os.listdir(sources_dir)):
+        import_content(os.path.join(sources_dir, name), os.path.splitext(name)[1].lstrip("."))
+
+def benchmark_project(project_path, only, repeat, jobs, pdf_limit):
+    """Times each selected benchmark on one project. Returns a list of result dicts."""
+    prefs = load_prefs(project_path)
+    chapters = list_chapters(project_path)
+    sources = os.listdir(os.path.join(project_path, "sources"))
+    # name: (run, setup before each run)
+    runs = {
+        "list_chapters": (lambda: list_chapters(project_path), None),
+        "import_content": (lambda: _import_sources(project_path), None),
+        # A first build with nothing cached, then rebuilding every page with warm caches, then a
+        # build that finds nothing to do
+        "build_html (cold)": (lambda: build_html(project_path, prefs, chapters, jobs=jobs), lambda: _clear_build_state(project_path)),
+        "build_html (forced)": (lambda: build_html(project_path, prefs, chapters, force=True, jobs=jobs), None),
+        "build_html (incremental)": (lambda: build_html(project_path, prefs, chapters, jobs=jobs), None),
+        "build_epub": (lambda: _expect_output(build_epub(project_path, prefs, chapters)), None),
+        "build_pdf": (lambda: _expect_output(build_pdf(project_path, prefs, chapters)), None),
+    }
+
+    results = []
+    for name in BENCHMARKS:
+        if only and name not in only and name.split(" ")[0] not in only:
+            continue
+        result = {"chapters": len(chapters), "benchmark": name}
+        if name == "import_content":
+            result["sources"] = len(sources)
+            result["source_format"] = os.path.splitext(sources[0])[1].lstrip(".") if sources else None
+        if name == "import_content" and not sources:
+            result["skipped"] = "no import sources"
+        elif name == "build_pdf" and len(chapters) > pdf_limit:
+            result["skipped"] = f"more than {pdf_limit} chapters"
+        else:
+            try:
+                timings = _time(*runs[name], repeat=repeat)
+                result.update({
+                    "seconds": [round(t, 6) for t in timings],
+                    "best": round(min(timings), 6),
+                    "median": round(statistics.median(timings), 6),
+                })
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+        results.append(result)
+        print(_describe(result))
+    return results
+
+def _describe(result):
+    label = f"{result['chapters']:>6} chapters  {result['benchmark']:<26}"
+    if "skipped" in result:
+        return f"{label} skipped ({result['skipped']})"
+    if "error" in result:
+        return f"{label} ❌ {result['error']}"
+    return f"{label} best {result['best']:.3f} s, median {result['median']:.3f} s"
+
+def compare(results, baseline_path):
+    """Prints each result's best time against the same benchmark in an earlier results file."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["chapters"], r["benchmark"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        earlier = baseline.get((result["chapters"], result["benchmark"]))
+        if earlier and "best" in earlier and "best" in result and earlier["best"]:
+            ratio = result["best"] / earlier["best"]
+            print(f"{result['chapters']:>6} chapters  {result['benchmark']:<26} {earlier['best']:.3f} s -> {result['best']:.3f} s ({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Chapter counts to benchmark")
+    parser.add_argument("--only", nargs="+", choices=sorted({name.split(" ")[0] for name in BENCHMARKS}), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs of each benchmark")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Processes for HTML chapter pages (0 = one per CPU)")
+    parser.add_argument("--fragment-size", type=int, default=DEFAULT_FRAGMENT_SIZE, help="Approximate bytes of HTML per chapter")
+    parser.add_argument("--sources", type=int, default=DEFAULT_SOURCES, help="Import sources per project")
+    parser.add_argument("--pdf-limit", type=int, default=DEFAULT_PDF_LIMIT, help="Skip build_pdf for projects with more chapters")
+    parser.add_argument("--no-cover", action="store_true", help="Generate projects without a cover image")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated projects")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    # The EPUB and PDF builders log every success at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    started = datetime.now(timezone.utc)
+    parameters = {
+        "sizes": args.sizes,
+        "repeat": args.repeat,
+        "jobs": args.jobs,
+        "fragment_size": args.fragment_size,
+        "sources": args.sources,
+        "cover_size": None if args.no_cover else list(DEFAULT_COVER_SIZE),
+        "seed": args.seed,
+    }
+    results = []
+    for size in args.sizes:
+        print(f"\n🛠️ Generating a {size}-chapter project...")
+        project_path = generate_project(size, args.fragment_size, args.sources,
+                                        None if args.no_cover else DEFAULT_COVER_SIZE, args.seed)
+        results += benchmark_project(project_path, args.only, args.repeat, args.jobs, args.pdf_limit)
+
+    report = {
+        "version": RESULTS_VERSION,
+        "started": started.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "commit": _git_commit(),
+        },
+        "parameters": parameters,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"\n✅ Results written to {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
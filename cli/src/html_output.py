@@ -4,6 +4,8 @@ import json
 from core.src.utils import load_prefs, save_prefs, load_json
 from cli.src.chapter_utils import format_chapter_heading
 from core.src.social_utils import load_links
+from core.src.profiling import BuildProfile
+from core.src.chapter_nav import build_neighbour_index, get_neighbours, published_chapters
 
 # Define default.css file for projects
 DEFAULT_CSS = """\
@@ -166,7 +168,7 @@ def choose_html_layout_features(project_path):
     save_prefs(project_path, prefs)
     return features
 
-def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapter_list=None):
+def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapter_list=None, neighbours=None):
     features = prefs.get("display_features", {})
     cover_path = prefs.get("cover_image", "")
     story_title = prefs.get("story_title", "")
@@ -192,7 +194,7 @@ def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapte
 
     # Top chapter Navigation
     if chapter and features.get("chapter_nav_top", True) and chapter_list:
-        html.append(html_chapter_nav(chapter, chapter_list, prefs))
+        html.append(html_chapter_nav(chapter, chapter_list, prefs, neighbours))
 
     # EPUB/PDF download links
     download_links = []
@@ -209,16 +211,18 @@ def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapte
     html.append('</header>')
     return "\n".join(html)
 
-def html_chapter_nav(current_chapter, chapter_list, prefs):
+def html_chapter_nav(current_chapter, chapter_list, prefs, neighbours=None):
     features = prefs.get("display_features", {})
     use_titles = features.get("use_chapter_titles", True)
 
-    index = next((i for i, ch in enumerate(chapter_list) if ch["number"] == current_chapter["number"]), None)
+    # build_html passes an index built once per build; standalone calls build their own
+    if neighbours is None:
+        neighbours = build_neighbour_index(chapter_list)
+    prev, nxt = get_neighbours(neighbours, current_chapter)
     nav_links = []
 
     # Previous
-    if index is not None and index > 0:
-        prev = chapter_list[index - 1]
+    if prev:
         prev_title = f"Chapter {prev['number']}: {prev['title']}" if use_titles else f"Chapter {prev['number']}"
         nav_links.append(f'<a href="{prev["number"]}.html">&larr; Previous ({prev_title})</a>')
     else:
@@ -228,8 +232,7 @@ def html_chapter_nav(current_chapter, chapter_list, prefs):
     nav_links.append('<a href="../index.html">Table of Contents</a>')
 
     # Next
-    if index is not None and index < len(chapter_list) - 1:
-        nxt = chapter_list[index + 1]
+    if nxt:
         next_title = f"Chapter {nxt['number']}: {nxt['title']}" if use_titles else f"Chapter {nxt['number']}"
         nav_links.append(f'<a href="{nxt["number"]}.html">Next ({next_title}) &rarr;</a>')
     else:
@@ -237,7 +240,7 @@ def html_chapter_nav(current_chapter, chapter_list, prefs):
 
     return f'<nav class="chapter-nav">\n  {" | ".join(nav_links)}\n</nav>'
 
-def html_footer(prefs, chapter=None, chapter_list=None, project_path=None):
+def html_footer(prefs, chapter=None, chapter_list=None, project_path=None, neighbours=None):
     try:
         share_links, follow_links, handles = load_links(project_path)
     except (FileNotFoundError, json.JSONDecodeError):
@@ -250,7 +253,7 @@ def html_footer(prefs, chapter=None, chapter_list=None, project_path=None):
 
     # Bottom Chapter Navigation
     if chapter and features.get("chapter_nav_bottom", True) and chapter_list:
-        html.append(html_chapter_nav(chapter, chapter_list, prefs))
+        html.append(html_chapter_nav(chapter, chapter_list, prefs, neighbours))
 
     # Share This Chapter Links
     if chapter and features.get("share_links", True) and share_links:
@@ -307,11 +310,22 @@ def html_footer(prefs, chapter=None, chapter_list=None, project_path=None):
     html.append('</footer>')
     return "\n".join(html)
 
-def build_html(project_path, prefs, chapters):
-    """Build HTML files for the project."""
+def build_html(project_path, prefs, chapters, jobs=None, profiler=None):
+    """
+    Build HTML files for the project, rendering chapter pages across `jobs` processes.
+    An enabled BuildProfile passed as profiler records each chapter page.
+    """
     print("\n🛠️ Generating HTML...")
-    for ch in chapters:
-        create_html_chapter_page(ch, chapters, prefs, project_path)
+    profiler = profiler or BuildProfile(project_path, "html", enabled=False)
+    chapters = published_chapters(chapters) # Drafts get no page and no TOC entry
+    neighbours = build_neighbour_index(chapters)
+    results = profiler.run_jobs(create_html_chapter_page, chapters, (chapters, prefs, project_path, neighbours), jobs,
+                                chapter_number=lambda ch: ch["number"])
+    for ch, (_, error, output) in zip(chapters, results):
+        if output:
+            print(output, end="")
+        if error:
+            print(f"❌ Chapter {ch['number']} failed: {error}")
     create_html_index_page(chapters, prefs, project_path)
     public_dir = os.path.join(project_path, "public")
     os.makedirs(public_dir, exist_ok=True)
@@ -339,7 +353,7 @@ def build_html(project_path, prefs, chapters):
     if os.path.isfile(cover_src) and not os.path.exists(cover_dst):
         shutil.copyfile(cover_src, cover_dst)
 
-def create_html_chapter_page(chapter, chapters, prefs, project_path):
+def create_html_chapter_page(chapter, chapters, prefs, project_path, neighbours=None):
     num = chapter["number"]
     slug = prefs["story_title"].lower().replace(" ", "_")
     includes_path = os.path.join(project_path, "includes", f"chapter_{num}.html")
@@ -357,10 +371,10 @@ def create_html_chapter_page(chapter, chapters, prefs, project_path):
     pdf_name = f"{slug}_chapter_{num}.pdf"
     pdf_path = os.path.join(project_path, "download", pdf_name)
     pdf_exists = os.path.exists(pdf_path)
-    header_block = html_header(prefs, chapter, epub_exists=os.path.exists(epub_path), pdf_exists=os.path.exists(pdf_path), chapter_list=chapters)
+    header_block = html_header(prefs, chapter, epub_exists=os.path.exists(epub_path), pdf_exists=os.path.exists(pdf_path), chapter_list=chapters, neighbours=neighbours)
 
     # FOOTER
-    footer_block = html_footer(prefs, chapter=chapter, chapter_list=chapters, project_path=project_path)
+    footer_block = html_footer(prefs, chapter=chapter, chapter_list=chapters, project_path=project_path, neighbours=neighbours)
 
     html = f"""<!DOCTYPE html>
 <html lang="en">
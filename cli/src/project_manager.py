@@ -11,6 +11,7 @@ from cli.src.chapters import manage_chapters
 from cli.src.licenses import load_license_definitions, save_license_definitions, choose_license
 from cli.src.social import choose_follow_links
 from cli.src.sharing import choose_share_links
+from core.src.profiling import BuildProfile, profile_summary
 
 def list_projects():
     base = "projects"
@@ -58,6 +59,8 @@ def manage_projects():
     licenses_path = os.path.join(os.path.dirname(__file__), "..", "data", "licenses.json")
     parser = argparse.ArgumentParser()
     parser.add_argument("--project", "-p", help="Project slug name")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Processes used to render HTML chapter pages (0 = one per CPU)")
+    parser.add_argument("--profile", action="store_true", help="Time and measure each publish stage and chapter, saving data/build_profile.json")
     args = parser.parse_args()
 
     projects = list_projects()
@@ -111,12 +114,18 @@ def manage_projects():
             ensure_cover_image(project_path, includes_path)
             chapters = load_json(chapters_path) # Corrected call to load_json
             formats = prompt_formats()
+            profiler = BuildProfile(project_path, "cli", enabled=args.profile)
             if "html" in formats:
-                build_html(project_path, prefs, chapters)
+                profiler.stage("html")
+                build_html(project_path, prefs, chapters, jobs=args.jobs, profiler=profiler)
             if "epub" in formats:
+                profiler.stage("epub")
                 build_epub(project_path)
             if "pdf" in formats:
+                profiler.stage("pdf")
                 build_pdf(project_path)
+            if profiler.finish():
+                print(f"⏱️ {profile_summary(profiler.report)}")
             print("\n✅ Publishing complete.")
         elif choice == "8": # Back
             break
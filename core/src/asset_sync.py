@@ -0,0 +1,115 @@
+import os
+import shutil
+from core.src.build_manifest import hash_file
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+# Files under includes/ that are published as-is. Chapter fragments, blurbs, summaries and
+# other working files are not assets.
+ASSET_EXTENSIONS = {
+    ".css", ".js",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".ico",
+    ".woff", ".woff2", ".ttf", ".otf",
+    ".mp3", ".ogg", ".mp4", ".webm"
+}
+# Subdirectories of includes/ that hold inputs to the build rather than published files
+EXCLUDED_DIRS = {"templates"}
+
+FICLONE = 0x40049409 # Linux ioctl: share the source's data blocks (btrfs, XFS, ...)
+
+def find_assets(includes_dir):
+    """Returns the paths, relative to includes_dir, of every publishable asset, sorted."""
+    assets = []
+    for dirpath, dirnames, filenames in os.walk(includes_dir):
+        if dirpath == includes_dir:
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+        for name in filenames:
+            if os.path.splitext(name)[1].lower() in ASSET_EXTENSIONS:
+                assets.append(os.path.relpath(os.path.join(dirpath, name), includes_dir))
+    return sorted(assets)
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except OSError:
+            return False
+    shutil.copystat(src, dst)
+    return True
+
+def _place(src, dst):
+    """
+    Puts src at dst, preferring a reflink, then a copy. Never a hard link: src is an editable
+    file under includes/, and editing it in place would change the live site and every
+    release with it.
+    The new file is created beside dst and moved over it, so an existing dst (which may be
+    hard-linked into an earlier release) is replaced rather than modified.
+    Returns the method used.
+    """
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        if _reflink(src, tmp):
+            method = "reflinked"
+        else:
+            shutil.copy2(src, tmp)
+            method = "copied"
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return method
+
+def sync_file(src, dst):
+    """
+    Makes dst match src, doing nothing if it already does.
+    Files are considered equal if they have the same size and modification time; if only the
+    size matches, their contents are hashed to decide. A dst hard-linked to src (as earlier
+    versions published assets) is replaced with a copy.
+    Returns "unchanged", "reflinked" or "copied".
+    """
+    src_stat = os.stat(src)
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        dst_stat = None
+
+    if dst_stat is not None and (src_stat.st_dev, src_stat.st_ino) != (dst_stat.st_dev, dst_stat.st_ino):
+        if src_stat.st_size == dst_stat.st_size:
+            if src_stat.st_mtime_ns == dst_stat.st_mtime_ns or hash_file(src) == hash_file(dst):
+                return "unchanged"
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    return _place(src, dst)
+
+def sync_assets(includes_dir, public_dir, previous_assets=(), exclude=()):
+    """
+    Publishes every asset under includes_dir to the same relative path under public_dir,
+    touching only the ones that changed, and removes assets that were published by an
+    earlier sync (previous_assets) but no longer exist or are now in exclude.
+    Returns (assets, results) where results maps each asset path to what sync_file did.
+    """
+    excluded = {os.path.normpath(path) for path in exclude}
+    assets = [asset for asset in find_assets(includes_dir) if asset not in excluded]
+    results = {}
+    for asset in assets:
+        results[asset] = sync_file(os.path.join(includes_dir, asset), os.path.join(public_dir, asset))
+
+    for asset in set(previous_assets) - set(assets):
+        stale = os.path.join(public_dir, asset)
+        if os.path.exists(stale):
+            os.remove(stale)
+            results[asset] = "removed"
+        # Drop directories the removal left empty
+        parent = os.path.dirname(stale)
+        while os.path.normpath(parent) != os.path.normpath(public_dir) and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    return assets, results
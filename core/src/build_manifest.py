@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+from core.src.utils import load_json, save_json
+
+# Bump when the page markup produced by the builders changes, so every page is regenerated once.
+RENDER_VERSION = 2
+MANIFEST_VERSION = 1
+
+# prefs.json keys that affect the static HTML output
+HTML_PREF_KEYS = ("story_title", "story_author", "cover_image", "copyright", "license", "display_features")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def get_build_manifest_path(project_path):
+    return os.path.join(project_path, "data", "build_manifest.json")
+
+def load_build_manifest(project_path):
+    """
+    Loads the persisted build manifest for a project.
+    Returns an empty manifest if none exists or it was written by an incompatible version.
+    """
+    manifest = load_json(get_build_manifest_path(project_path))
+    if manifest.get("version") != MANIFEST_VERSION:
+        manifest = {"version": MANIFEST_VERSION}
+    manifest.setdefault("sources", {})
+    manifest.setdefault("pages", {})
+    return manifest
+
+def save_build_manifest(project_path, manifest):
+    save_json(get_build_manifest_path(project_path), manifest)
+
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+def hash_value(value):
+    """Returns a stable SHA-256 hex digest of any JSON-serialisable value."""
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def hash_source(manifest, path):
+    """
+    Returns the content hash of a source file, reusing the hash recorded in the manifest
+    when the file's size and modification time have not changed since the last build.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        manifest["sources"].pop(path, None)
+        return None
+
+    cached = manifest["sources"].get(path)
+    if cached and cached.get("size") == stat.st_size and cached.get("mtime_ns") == stat.st_mtime_ns:
+        return cached["hash"]
+
+    digest = hash_file(path)
+    manifest["sources"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+    return digest
+
+def page_is_current(manifest, page, signature, output_path):
+    """True if the page was last built from the same inputs and is still on disk."""
+    return manifest["pages"].get(page) == signature and os.path.exists(output_path)
+
+def record_page(manifest, page, signature):
+    manifest["pages"][page] = signature
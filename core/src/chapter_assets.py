@@ -0,0 +1,102 @@
+import os
+import json
+import posixpath
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, unquote
+from core.src.asset_sync import ASSET_EXTENSIONS
+from core.src.build_manifest import hash_file
+from core.src.fileio import replace_file
+
+# Bump when the scanner changes, so cached reference lists are rebuilt.
+SCANNER_VERSION = 1
+
+# Attributes whose value is a single URL, plus srcset (a list of "url width" candidates)
+URL_ATTRIBUTES = {"src", "href", "poster", "data"}
+
+# Media that is already compressed; deflating it again wastes time for no gain.
+COMPRESSED_MEDIA_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif",
+    ".woff", ".woff2", ".mp3", ".ogg", ".mp4", ".webm"
+}
+
+class _ReferenceParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.references = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if not value:
+                continue
+            if name in URL_ATTRIBUTES:
+                self.references.append(value)
+            elif name == "srcset":
+                self.references.extend(candidate.split()[0] for candidate in value.split(",") if candidate.strip())
+
+    handle_startendtag = handle_starttag
+
+def _local_path(reference):
+    """
+    Returns the includes/-relative path a reference points at, or None for anything that is
+    not a local file: other sites, data: URIs, fragment links, root-relative paths and paths
+    that climb out of includes/.
+    """
+    parts = urlsplit(reference.strip())
+    if parts.scheme or parts.netloc or not parts.path or parts.path.startswith("/"):
+        return None
+    path = posixpath.normpath(unquote(parts.path))
+    if path.startswith("../") or path == "..":
+        return None
+    if os.path.splitext(path)[1].lower() not in ASSET_EXTENSIONS:
+        return None
+    return path
+
+def scan_fragment(fragment_path):
+    """Returns the sorted, de-duplicated local asset paths referenced by a chapter fragment."""
+    parser = _ReferenceParser()
+    with open(fragment_path, "r", encoding="utf-8") as f:
+        parser.feed(f.read())
+    parser.close()
+    return sorted({path for path in map(_local_path, parser.references) if path})
+
+def get_asset_cache_path(project_path):
+    return os.path.join(project_path, "cache", "assets")
+
+def fragment_assets(project_path, fragment_path, fragment_hash=None):
+    """
+    Returns the asset paths a chapter fragment references, parsing the fragment only the first
+    time its content is seen: results are cached under cache/assets/ by content hash.
+    """
+    fragment_hash = fragment_hash or hash_file(fragment_path)
+    if fragment_hash is None:
+        return []
+    cache_path = os.path.join(get_asset_cache_path(project_path), f"{fragment_hash}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == SCANNER_VERSION:
+            return cached["assets"]
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError, KeyError):
+        pass
+
+    assets = scan_fragment(fragment_path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with replace_file(cache_path) as f:
+        f.write(json.dumps({"version": SCANNER_VERSION, "assets": assets}).encode("utf-8"))
+    return assets
+
+def collect_chapter_assets(project_path, fragments):
+    """
+    Builds the asset list for a set of chapters: fragments is an iterable of
+    (fragment_path, fragment_hash or None). Each asset that exists under includes/ is listed
+    once, in order of first reference, however many chapters use it.
+    """
+    includes_path = os.path.join(project_path, "includes")
+    seen = {}
+    for fragment_path, fragment_hash in fragments:
+        if not os.path.exists(fragment_path):
+            continue
+        for asset in fragment_assets(project_path, fragment_path, fragment_hash):
+            if asset not in seen and os.path.isfile(os.path.join(includes_path, asset)):
+                seen[asset] = None
+    return list(seen)
@@ -0,0 +1,25 @@
+def published_chapters(chapters):
+    """
+    The chapters that appear on the site, in their original order: every one not marked as a
+    draft. Drafts get no page and are left out of the TOC, navigation, search and feeds.
+    """
+    return [ch for ch in chapters if not ch.get("draft")]
+
+def build_neighbour_index(chapters):
+    """
+    Maps each published chapter number to its (previous, next) chapter dicts, or None at either end.
+    Chapters are ordered by number, so gaps in the numbering are skipped over, and drafts are
+    left out entirely: they neither appear in the index nor act as anyone's neighbour.
+    Build it once per run so chapter navigation is a dict lookup instead of a scan of the list.
+    """
+    published = sorted(published_chapters(chapters), key=lambda ch: ch.get("number", 0))
+    index = {}
+    for i, ch in enumerate(published):
+        prev_ch = published[i - 1] if i > 0 else None
+        next_ch = published[i + 1] if i < len(published) - 1 else None
+        index[ch["number"]] = (prev_ch, next_ch)
+    return index
+
+def get_neighbours(index, chapter):
+    """Returns (previous, next) for a chapter, or (None, None) if it is not in the index."""
+    return index.get(chapter["number"], (None, None))
@@ -0,0 +1,275 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import zipfile
+import shutil
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from core.src.parallel import resolve_jobs
+from core.src.build_manifest import hash_file
+from core.src.fileio import replace_file
+
+# Local file header: signature, versions, flags, method, time, date, CRC, sizes, name and extra lengths
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_DATA_DESCRIPTOR_FLAG = 0x08
+# Entries being compressed at once per worker thread in write_entries()
+ENTRIES_IN_FLIGHT_PER_WORKER = 4
+# Every entry of a reproducible archive gets this timestamp (the earliest a zip can hold) and mode
+REPRODUCIBLE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ENTRY_ATTR = 0o600 << 16 # As ZipFile.writestr
+# write_raw_entry appends pre-compressed data through ZipFile internals that are not public
+# API. They are only used on the CPython versions they have been checked against; elsewhere
+# entries are decompressed and written through ZipFile.open() instead.
+RAW_WRITE_VERSIONS = ((3, 8), (3, 14))
+_RAW_WRITE_ATTRIBUTES = ("_lock", "_writing", "_seekable", "_writecheck", "_didModify", "start_dir", "fp", "filelist", "NameToInfo")
+
+def deflate_raw(data, level=zlib.Z_DEFAULT_COMPRESSION):
+    """Compresses data as a raw deflate stream, exactly as ZipFile does for ZIP_DEFLATED entries."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+def prepare_entry(name, data, compress_type=zipfile.ZIP_DEFLATED, date_time=None):
+    """
+    Compresses an entry ahead of time. Returns (ZipInfo, raw bytes) for write_raw_entry, so the
+    same compressed data can be written to any number of archives. The entry is dated now
+    unless date_time is given.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    zinfo = zipfile.ZipInfo(name, date_time or time.localtime(time.time())[:6])
+    zinfo.compress_type = compress_type
+    zinfo.external_attr = ENTRY_ATTR
+    zinfo.CRC = zlib.crc32(data)
+    zinfo.file_size = len(data)
+    return zinfo, deflate_raw(data) if compress_type == zipfile.ZIP_DEFLATED else data
+
+def read_raw_entry(fp, zinfo):
+    """Returns an entry's stored bytes, still compressed, from an open archive file."""
+    fp.seek(zinfo.header_offset)
+    header = _LOCAL_HEADER.unpack(fp.read(_LOCAL_HEADER.size))
+    fp.seek(header[10] + header[11], os.SEEK_CUR) # Skip the file name and extra field
+    return fp.read(zinfo.compress_size)
+
+def raw_write_supported(zf):
+    """True if write_raw_entry can copy compressed bytes into zf as they are."""
+    low, high = RAW_WRITE_VERSIONS
+    return (
+        sys.implementation.name == "cpython" and low <= sys.version_info[:2] <= high
+        and all(hasattr(zf, name) for name in _RAW_WRITE_ATTRIBUTES)
+    )
+
+def write_raw_entry(zf, source_info, raw, date_time=None, external_attr=None):
+    """
+    Appends an entry whose data is already compressed (raw, as read by read_raw_entry) to a
+    ZipFile open for writing, with the CRC, sizes and method of source_info, and its date and
+    mode unless others are given.
+    zipfile has no public API for this, so it does what ZipFile.open(name, "w") does, minus
+    the compression. Where that is not known to work (see raw_write_supported), the data is
+    decompressed and written through ZipFile.open() instead, which gives an equivalent entry.
+    """
+    zinfo = zipfile.ZipInfo(source_info.filename, date_time or source_info.date_time)
+    zinfo.compress_type = source_info.compress_type
+    zinfo.external_attr = source_info.external_attr if external_attr is None else external_attr
+    if not raw_write_supported(zf):
+        data = zlib.decompress(raw, -15) if zinfo.compress_type == zipfile.ZIP_DEFLATED else raw
+        with zf.open(zinfo, "w") as dest:
+            dest.write(data)
+        return
+    # Sizes go in the local header, so there is no data descriptor after the data
+    zinfo.flag_bits = source_info.flag_bits & ~_DATA_DESCRIPTOR_FLAG
+    zinfo.CRC = source_info.CRC
+    zinfo.compress_size = len(raw)
+    zinfo.file_size = source_info.file_size
+
+    with zf._lock:
+        if zf._writing:
+            raise ValueError("Can't write to the ZIP file while another write handle is open.")
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+        zf.fp.write(zinfo.FileHeader())
+        zf.fp.write(raw)
+        zf.start_dir = zf.fp.tell()
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+
+def _archive_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+class EpubArchive:
+    """
+    The ZipFile an EPUB is written to, with the same writestr()/write() calls. Each entry's
+    content hash is recorded, and an entry whose content and compression match the previous
+    build is copied from the previous archive as raw compressed bytes instead of being
+    compressed again.
+    With date_time set (see REPRODUCIBLE_DATE_TIME) every entry, reused or not, is written
+    with that date and the same mode, so the archive depends only on its contents.
+    """
+    def __init__(self, zf, previous_fp, previous_entries, date_time=None):
+        self.zf = zf
+        self.previous_fp = previous_fp
+        self.previous_entries = previous_entries # name: (hash, ZipInfo)
+        self.date_time = date_time
+        self.hashes = {}
+        self.reused = 0
+        self.compressed = 0
+
+    def _info(self, name, compress_type):
+        """What to pass ZipFile for a new entry: just the name, or a ZipInfo with the fixed date and mode."""
+        if self.date_time is None:
+            return name
+        zinfo = zipfile.ZipInfo(name, self.date_time)
+        zinfo.compress_type = compress_type
+        zinfo.external_attr = ENTRY_ATTR
+        return zinfo
+
+    def _reuse(self, name, digest):
+        previous = self.previous_entries.get(name)
+        if not previous or previous[0] != digest:
+            return False
+        raw = read_raw_entry(self.previous_fp, previous[1])
+        if self.date_time is None:
+            write_raw_entry(self.zf, previous[1], raw)
+        else:
+            write_raw_entry(self.zf, previous[1], raw, self.date_time, ENTRY_ATTR)
+        self.hashes[name] = digest
+        self.reused += 1
+        return True
+
+    def writestr(self, name, data, compress_type=zipfile.ZIP_DEFLATED):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = f"{compress_type}:{hashlib.sha256(data).hexdigest()}"
+        if not self._reuse(name, digest):
+            self.zf.writestr(self._info(name, compress_type), data, compress_type=compress_type)
+            self.hashes[name] = digest
+            self.compressed += 1
+
+    def _prepare(self, entry):
+        """
+        Hashes and, unless it can be reused, deflates one entry. Runs on a worker thread:
+        hashlib and zlib release the GIL on large buffers, so entries compress in parallel.
+        """
+        name, data = entry
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = f"{zipfile.ZIP_DEFLATED}:{hashlib.sha256(data).hexdigest()}"
+        previous = self.previous_entries.get(name)
+        if previous and previous[0] == digest:
+            return name, digest, None
+        return name, digest, prepare_entry(name, data, date_time=self.date_time)
+
+    def _write_prepared(self, name, digest, deflated):
+        if deflated is None:
+            self._reuse(name, digest)
+            return
+        write_raw_entry(self.zf, *deflated)
+        self.hashes[name] = digest
+        self.compressed += 1
+
+    def write_entries(self, entries, jobs=None):
+        """
+        Writes an iterable of (name, data) deflated entries in order. With jobs > 1 (0 = one
+        per CPU) entries are hashed and compressed on a thread pool, a few at a time, and the
+        compressed bytes appended to the archive in their original order; the archive is
+        identical to one written serially.
+        """
+        workers = resolve_jobs(jobs)
+        if workers <= 1:
+            for name, data in entries:
+                self.writestr(name, data)
+            return
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for entry in entries:
+                in_flight.append(executor.submit(self._prepare, entry))
+                if len(in_flight) >= workers * ENTRIES_IN_FLIGHT_PER_WORKER:
+                    self._write_prepared(*in_flight.popleft().result())
+            while in_flight:
+                self._write_prepared(*in_flight.popleft().result())
+
+    def write_stream(self, name, chunks):
+        """
+        Writes a deflated entry from chunks, a callable returning an iterable of str or bytes
+        pieces, without holding the whole entry in memory. The pieces are generated once to
+        hash them and, unless the previous archive's entry can be reused, once more to write.
+        """
+        digest = hashlib.sha256()
+        for chunk in chunks():
+            digest.update(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        digest = f"{zipfile.ZIP_DEFLATED}:{digest.hexdigest()}"
+        if self._reuse(name, digest):
+            return
+        with self.zf.open(self._info(name, zipfile.ZIP_DEFLATED), "w") as dest:
+            for chunk in chunks():
+                dest.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        self.hashes[name] = digest
+        self.compressed += 1
+
+    def write(self, path, name, compress_type=zipfile.ZIP_DEFLATED):
+        digest = f"{compress_type}:{hash_file(path)}"
+        if not self._reuse(name, digest):
+            if self.date_time is None:
+                self.zf.write(path, name, compress_type=compress_type)
+            else:
+                # ZipFile.write() would take the date and mode from the file
+                with open(path, "rb") as src, self.zf.open(self._info(name, compress_type), "w") as dest:
+                    shutil.copyfileobj(src, dest)
+            self.hashes[name] = digest
+            self.compressed += 1
+
+def _open_previous(output_path, record):
+    """
+    Opens the previous build of output_path if it is the archive record describes. Returns
+    (file, {name: (hash, ZipInfo)}), or (None, {}) when there is nothing to reuse.
+    """
+    if not record or record.get("archive") != _archive_signature(output_path):
+        return None, {}
+    fp = open(output_path, "rb")
+    try:
+        with zipfile.ZipFile(fp) as previous:
+            infos = {info.filename: info for info in previous.infolist()}
+    except zipfile.BadZipFile:
+        fp.close()
+        return None, {}
+    entries = {
+        name: (digest, infos[name])
+        for name, digest in record.get("entries", {}).items() if name in infos
+    }
+    return fp, entries
+
+@contextmanager
+def epub_archive(output_path, records, key, reproducible=False):
+    """
+    Opens an EpubArchive that replaces output_path once the block completes. records is the
+    dict (kept in the build manifest) that describes each archive by key; the previous build's
+    entry hashes are read from records[key] and the new ones stored there.
+    With reproducible=True entries get fixed dates and modes, and an existing output_path with
+    the same bytes is left untouched; archive.rewritten tells whether the file was replaced.
+    """
+    previous_signature = _archive_signature(output_path)
+    previous_fp, previous_entries = _open_previous(output_path, records.get(key))
+    try:
+        with replace_file(output_path, keep_identical=reproducible) as f:
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+                archive = EpubArchive(zf, previous_fp, previous_entries, REPRODUCIBLE_DATE_TIME if reproducible else None)
+                yield archive
+            # Closed before the new archive is moved over it, which Windows refuses for an open file
+            if previous_fp:
+                previous_fp.close()
+    finally:
+        if previous_fp:
+            previous_fp.close()
+    signature = _archive_signature(output_path)
+    archive.rewritten = signature != previous_signature
+    records[key] = {"archive": signature, "entries": archive.hashes}
@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+# The sitemaps.org limit on URLs per sitemap file
+SITEMAP_SHARD_SIZE = 50000
+DEFAULT_FEED_ENTRIES = 20
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+def update_entry_dates(manifest, key, content_signature, source_path):
+    """
+    Returns the stable {"published", "updated"} timestamps of a feed entry, kept in the manifest.
+    A new entry takes its source file's modification time for both; after that "updated" moves
+    only when content_signature (the entry's text and title, not its page markup) changes, so
+    rebuilding the site never makes old entries look new to feed readers.
+    """
+    entries = manifest.setdefault("entries", {})
+    entry = entries.get(key)
+    if entry and entry["content"] == content_signature:
+        return entry
+    now = _timestamp(os.stat(source_path).st_mtime) if entry is None else datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+    entry = {
+        "content": content_signature,
+        "published": entry["published"] if entry else now,
+        "updated": now,
+    }
+    entries[key] = entry
+    return entry
+
+def atom_feed(site_url, title, author, entries):
+    """
+    Renders an Atom feed. entries is a list of {"title", "url", "published", "updated", "summary"}
+    dicts, newest first. The output depends only on its inputs, so an unchanged feed is
+    byte-for-byte identical and need not be rewritten.
+    """
+    updated = max((entry["updated"] for entry in entries), default="1970-01-01T00:00:00Z")
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"  <title>{escape(title)}</title>",
+        f"  <id>{escape(site_url)}</id>",
+        f"  <link href={quoteattr(site_url)}/>",
+        f"  <link rel=\"self\" href={quoteattr(site_url + 'feed.xml')}/>",
+        f"  <updated>{updated}</updated>",
+        f"  <author><name>{escape(author)}</name></author>",
+    ]
+    for entry in entries:
+        lines += [
+            "  <entry>",
+            f"    <title>{escape(entry['title'])}</title>",
+            f"    <id>{escape(entry['url'])}</id>",
+            f"    <link href={quoteattr(entry['url'])}/>",
+            f"    <published>{entry['published']}</published>",
+            f"    <updated>{entry['updated']}</updated>",
+        ]
+        if entry.get("summary"):
+            lines.append(f"    <summary>{escape(entry['summary'])}</summary>")
+        lines.append("  </entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+def shard_urls(urls, shard_size=SITEMAP_SHARD_SIZE):
+    """Splits (url, lastmod or None) pairs into sitemap shards of at most shard_size URLs."""
+    return [urls[i:i + shard_size] for i in range(0, len(urls), shard_size)]
+
+def sitemap(urls):
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for url, lastmod in urls:
+        lastmod_tag = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+        lines.append(f"  <url><loc>{escape(url)}</loc>{lastmod_tag}</url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+def sitemap_index(shards):
+    """shards is a list of (sitemap url, lastmod or None)."""
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for url, lastmod in shards:
+        lastmod_tag = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+        lines.append(f"  <sitemap><loc>{escape(url)}</loc>{lastmod_tag}</sitemap>")
+    lines.append("</sitemapindex>")
+    return "\n".join(lines) + "\n"
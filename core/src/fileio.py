@@ -0,0 +1,67 @@
+import os
+import shutil
+import filecmp
+from contextlib import contextmanager
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def copy_stream(src, dst):
+    """
+    Appends the rest of the open binary file src to the open binary file dst.
+    Uses os.copy_file_range or os.sendfile so the data is copied by the kernel without
+    passing through Python, falling back to a chunked copy where neither is available.
+    Memory use is constant regardless of the source size.
+    """
+    dst.flush()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    remaining = os.fstat(src_fd).st_size - src.tell()
+
+    for kernel_copy in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if kernel_copy is None or remaining <= 0:
+            continue
+        try:
+            while remaining > 0:
+                if kernel_copy is os.sendfile:
+                    copied = os.sendfile(dst_fd, src_fd, None, min(remaining, 1 << 30))
+                else:
+                    copied = os.copy_file_range(src_fd, dst_fd, min(remaining, 1 << 30))
+                if copied == 0:
+                    break
+                remaining -= copied
+            # Resynchronise the Python file objects with the kernel offsets
+            src.seek(os.lseek(src_fd, 0, os.SEEK_CUR))
+            dst.seek(0, os.SEEK_END)
+            return
+        except OSError:
+            # Unsupported on this filesystem pair; try the next strategy from where we are
+            src.seek(os.lseek(src_fd, 0, os.SEEK_CUR))
+            dst.seek(0, os.SEEK_END)
+
+    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+@contextmanager
+def replace_file(path, keep_identical=False):
+    """
+    Opens a temporary file next to path for binary writing and moves it over path once the
+    block completes, so readers never see a partly written file. The existing file is replaced,
+    never rewritten in place, which matters when it is hard-linked into an earlier release.
+    With keep_identical=True an existing file with the same bytes is kept as it is, modification
+    time included, and the new copy discarded.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        if keep_identical and os.path.isfile(path) and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def replace_copy(src_path, dst_path):
+    """Copies src_path over dst_path using replace_file."""
+    with open(src_path, "rb") as src, replace_file(dst_path) as dst:
+        copy_stream(src, dst)
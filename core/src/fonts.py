@@ -0,0 +1,160 @@
+import os
+import logging
+from html.parser import HTMLParser
+from core.src.build_manifest import hash_file, hash_value
+from core.src.fileio import replace_file
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    subset = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# The subsetter logs every table it touches at INFO
+logging.getLogger("fontTools").setLevel(logging.WARNING)
+
+# Bump when the subsetting options change, so cached subsets are regenerated.
+SUBSET_VERSION = 1
+
+FONT_MEDIA_TYPES = {
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+}
+CSS_FORMATS = {".ttf": "truetype", ".otf": "opentype", ".woff": "woff", ".woff2": "woff2"}
+
+def get_fonts_dir(project_path):
+    """Fonts to embed in the EPUB and PDF go in includes/fonts/."""
+    return os.path.join(project_path, "includes", "fonts")
+
+def get_font_cache_path(project_path):
+    return os.path.join(project_path, "cache", "fonts")
+
+def find_fonts(project_path):
+    """Returns the font files under includes/fonts/, sorted by name."""
+    fonts_dir = get_fonts_dir(project_path)
+    if not os.path.isdir(fonts_dir):
+        return []
+    return sorted(
+        os.path.join(fonts_dir, name) for name in os.listdir(fonts_dir)
+        if os.path.splitext(name)[1].lower() in FONT_MEDIA_TYPES
+    )
+
+class _TextCollector(HTMLParser):
+    def __init__(self, characters):
+        super().__init__(convert_charrefs=True)
+        self.characters = characters
+
+    def handle_data(self, data):
+        self.characters.update(data)
+
+def collect_characters(fragment_paths, extra_text=()):
+    """
+    Returns the set of characters a book shows: the text of every chapter fragment (tags left
+    out, entities decoded), read in a single pass, plus extra_text such as titles.
+    """
+    characters = set()
+    parser = _TextCollector(characters)
+    for path in fragment_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            parser.feed(f.read())
+        parser.close()
+        parser.reset()
+    for text in extra_text:
+        characters.update(text)
+    return characters
+
+def _font_face(font):
+    """The CSS family, weight and style a font declares."""
+    family = font["name"].getBestFamilyName() or "Embedded"
+    os2 = font["OS/2"] if "OS/2" in font else None
+    weight = os2.usWeightClass if os2 else 400
+    italic = (os2.fsSelection & 1) if os2 else (font["head"].macStyle & 2)
+    return {"family": family, "weight": weight, "style": "italic" if italic else "normal"}
+
+def subset_font(project_path, font_path, characters):
+    """
+    Returns (path, face) for a copy of the font reduced to the glyphs for characters, kept in
+    the same format; face is its family, weight and style. Subsets are cached under
+    cache/fonts/ by the hash of the font and the character set, so they are only made once.
+    Returns None if the font can't be read.
+    """
+    extension = os.path.splitext(font_path)[1].lower()
+    key = hash_value({
+        "version": SUBSET_VERSION,
+        "font": hash_file(font_path),
+        "characters": "".join(sorted(characters)),
+    })
+    cache_dir = get_font_cache_path(project_path)
+    subset_path = os.path.join(cache_dir, f"{key}{extension}")
+    # fontTools' defaults keep the common OpenType features (kerning, ligatures and so on)
+    options = subset.Options()
+    options.notdef_outline = True
+    options.flavor = extension.lstrip(".") if extension in (".woff", ".woff2") else None
+    try:
+        if os.path.exists(subset_path):
+            with TTFont(subset_path, lazy=True) as font:
+                return subset_path, _font_face(font)
+        font = subset.load_font(font_path, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=[ord(character) for character in characters])
+        subsetter.subset(font)
+        os.makedirs(cache_dir, exist_ok=True)
+        with replace_file(subset_path) as f:
+            subset.save_font(font, f, options)
+        return subset_path, _font_face(font)
+    except Exception as e:
+        logging.error(f"Could not subset font {font_path}: {e}")
+        return None
+
+def embedded_fonts(project_path, chapters, exclude_key, extra_text=()):
+    """
+    Subsets every font under includes/fonts/ to the characters of the chapters not flagged
+    exclude_key (their text and titles) and extra_text. Returns a list of dicts with the
+    font's path and file name, the subset's path, media type and CSS face, in file name
+    order; an empty list when there are no fonts or fontTools is not installed.
+    """
+    fonts = find_fonts(project_path)
+    if not fonts:
+        return []
+    if subset is None:
+        logging.warning("fontTools is not installed; fonts are not embedded.")
+        return []
+    included = [chapter for chapter in chapters if not chapter.get(exclude_key)]
+    fragments = [
+        path for path in (os.path.join(project_path, "includes", f"chapter_{chapter['number']}.html") for chapter in included)
+        if os.path.exists(path)
+    ]
+    characters = collect_characters(fragments, [chapter["title"] for chapter in included] + list(extra_text))
+    embedded = []
+    for font_path in fonts:
+        result = subset_font(project_path, font_path, characters)
+        if result:
+            subset_path, face = result
+            extension = os.path.splitext(font_path)[1].lower()
+            embedded.append({
+                "source": font_path,
+                "path": subset_path,
+                "name": os.path.basename(font_path),
+                "media_type": FONT_MEDIA_TYPES[extension],
+                "format": CSS_FORMATS[extension],
+                **face,
+            })
+    return embedded
+
+def font_face_css(fonts, url):
+    """
+    @font-face rules for embedded fonts, with url(font) giving each one's URL. Body text is set
+    in the family of the first font.
+    """
+    rules = [
+        f'@font-face {{ font-family: "{font["family"]}"; src: url("{url(font)}") format("{font["format"]}"); '
+        f'font-weight: {font["weight"]}; font-style: {font["style"]}; }}'
+        for font in fonts
+    ]
+    if fonts:
+        rules.append(f'body {{ font-family: "{fonts[0]["family"]}", serif; }}')
+    return "\n".join(rules)
@@ -0,0 +1,66 @@
+import re
+
+# Comments, raw-text elements (skipped whole, so markup inside them is ignored) and tags
+_TOKEN_RE = re.compile(
+    r"<!--.*?-->|<(script|style)\b[^>]*>.*?</\1\s*>|<(/?)([a-zA-Z][a-zA-Z0-9:-]*)\b[^>]*>",
+    re.S | re.I
+)
+# Elements that never have a closing tag
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# A fragment may be split after one of these closes...
+_SPLIT_AFTER = {"p", "div", "blockquote", "figure", "section", "article", "aside", "h1", "h2", "h3", "h4", "h5", "h6"}
+# ...unless it is inside one of these, whose structure a split would break
+_NO_SPLIT_INSIDE = {"ul", "ol", "dl", "table", "pre", "figure"}
+
+def _split_points(html):
+    """
+    Yields (offset, open elements) for each place the fragment can be split: just after a
+    paragraph or other block closes. The open elements are the (name, start tag) pairs of the
+    wrappers still open there, outermost first.
+    """
+    stack = []
+    for match in _TOKEN_RE.finditer(html):
+        name = match.group(3)
+        if not name:
+            continue # Comment or script/style
+        name = name.lower()
+        if match.group(2):
+            # Close the element, and any unclosed ones inside it; a stray closing tag is ignored
+            if any(open_name == name for open_name, _ in stack):
+                while stack.pop()[0] != name:
+                    pass
+            if name in _SPLIT_AFTER and not any(open_name in _NO_SPLIT_INSIDE for open_name, _ in stack):
+                yield match.end(), tuple(stack)
+        elif name not in _VOID_TAGS and not match.group(0).endswith("/>"):
+            if name == "p" and stack and stack[-1][0] == "p":
+                stack.pop() # A new paragraph implicitly closes an unclosed one
+            stack.append((name, match.group(0)))
+
+def split_fragment(html, max_bytes):
+    """
+    Splits chapter HTML into parts of at most max_bytes (UTF-8) where it can: parts end
+    between paragraphs, never inside one, so a single paragraph larger than max_bytes stays
+    whole. Wrappers open at a split (such as a <div> around the whole chapter) are closed at
+    the end of the part and reopened at the start of the next, so every part is well formed.
+    Returns a list of one or more parts.
+    """
+    if len(html.encode("utf-8")) <= max_bytes:
+        return [html]
+    parts = []
+    start, start_stack = 0, ()
+    previous, previous_stack = 0, ()
+    size = 0
+    for offset, stack in list(_split_points(html)) + [(len(html), ())]:
+        segment = html[previous:offset]
+        segment_size = len(segment.encode("utf-8"))
+        # A run of whitespace between blocks stays with the part before it
+        if size and size + segment_size > max_bytes and segment.strip():
+            parts.append(_part(html[start:previous], start_stack, previous_stack))
+            start, start_stack, size = previous, previous_stack, 0
+        size += segment_size
+        previous, previous_stack = offset, stack
+    parts.append(_part(html[start:], start_stack, ()))
+    return parts
+
+def _part(text, reopen, close):
+    return "".join(tag for _, tag in reopen) + text + "".join(f"</{name}>" for name, _ in reversed(close))
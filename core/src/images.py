@@ -0,0 +1,127 @@
+import os
+import json
+import logging
+from core.src.build_manifest import hash_file
+from core.src.fileio import replace_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Bump when the variant sizes or encoder settings change, so cached variants are regenerated.
+IMAGE_PIPELINE_VERSION = 1
+
+# Widths for the site's srcset; none is wider than the source.
+WEB_WIDTHS = (480, 960, 1440)
+# Bounding boxes: a typical e-reader cover, and a 6x9 inch page at 300 DPI.
+EPUB_SIZE = (1600, 2560)
+PRINT_DPI = 300
+PRINT_SIZE = (6 * PRINT_DPI, 9 * PRINT_DPI)
+
+# Formats Pillow can't rasterize meaningfully; these are published as they are.
+PASSTHROUGH_EXTENSIONS = {".svg"}
+
+def get_image_cache_path(project_path):
+    return os.path.join(project_path, "cache", "images")
+
+def _save(image, path, fmt, **options):
+    with replace_file(path) as f:
+        image.save(f, fmt, **options)
+
+def _flatten(image):
+    """JPEG has no alpha channel: composite transparent images onto white."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+def _fit(image, box):
+    """Returns a copy of image scaled down to fit box, never scaled up."""
+    fitted = image.copy()
+    fitted.thumbnail(box, Image.LANCZOS)
+    return fitted
+
+def _render_variants(src_path, variant_dir):
+    """Decodes the source image once and writes every variant into variant_dir."""
+    with Image.open(src_path) as source:
+        # Large JPEGs can be decoded at reduced scale, which is much faster
+        source.draft("RGB", PRINT_SIZE)
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    width, height = image.size
+    opaque = _flatten(image)
+    webp_source = image if image.mode in ("RGB", "RGBA") else image.convert("RGBA")
+
+    web = []
+    widths = sorted({min(w, width) for w in WEB_WIDTHS})
+    for w in widths:
+        box = (w, height)
+        name = f"cover-{w}"
+        fitted = _fit(opaque, box)
+        _save(fitted, os.path.join(variant_dir, f"{name}.jpg"), "JPEG", quality=85, optimize=True, progressive=True)
+        _save(_fit(webp_source, box), os.path.join(variant_dir, f"{name}.webp"), "WEBP", quality=80, method=4)
+        web.append({"width": fitted.width, "height": fitted.height, "webp": f"{name}.webp", "jpeg": f"{name}.jpg"})
+
+    _save(_fit(opaque, EPUB_SIZE), os.path.join(variant_dir, "cover-epub.jpg"), "JPEG", quality=85, optimize=True)
+    _save(_fit(opaque, PRINT_SIZE), os.path.join(variant_dir, "cover-print.jpg"), "JPEG",
+          quality=92, optimize=True, dpi=(PRINT_DPI, PRINT_DPI))
+
+    return {
+        "version": IMAGE_PIPELINE_VERSION,
+        "width": width,
+        "height": height,
+        "web": web,
+        # Mid-sized JPEG for browsers without srcset and for themes that use cover_name
+        "fallback": web[min(1, len(web) - 1)],
+        "epub": "cover-epub.jpg",
+        "print": "cover-print.jpg",
+    }
+
+def cover_variants(project_path, src_path, source_hash=None):
+    """
+    Returns the per-target variants of a cover image, generating them on first use:
+    WebP and JPEG copies at each of WEB_WIDTHS for the site's srcset, a JPEG sized for
+    e-readers and a print-resolution JPEG for the PDF.
+
+    Variants are cached under cache/images/<source hash>/, so the image is decoded once
+    when it changes and every later build (HTML, EPUB or PDF) reuses the files.
+    Returns None if Pillow is unavailable or the image can't be converted. File names in the
+    returned dict are relative to its "dir".
+    """
+    if Image is None or os.path.splitext(src_path)[1].lower() in PASSTHROUGH_EXTENSIONS:
+        return None
+    source_hash = source_hash or hash_file(src_path)
+    if source_hash is None:
+        return None
+
+    variant_dir = os.path.join(get_image_cache_path(project_path), source_hash)
+    index_path = os.path.join(variant_dir, "variants.json")
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            variants = json.load(f)
+        if variants.get("version") == IMAGE_PIPELINE_VERSION:
+            variants["dir"] = variant_dir
+            return variants
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    os.makedirs(variant_dir, exist_ok=True)
+    try:
+        variants = _render_variants(src_path, variant_dir)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logging.warning(f"Could not create image variants for {src_path}: {e}")
+        return None
+
+    # Written last: its presence means every variant is complete
+    with replace_file(index_path) as f:
+        f.write(json.dumps(variants, indent=4).encode("utf-8"))
+    logging.info(f"Created cover image variants in {variant_dir}")
+    variants["dir"] = variant_dir
+    return variants
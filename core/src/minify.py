@@ -0,0 +1,81 @@
+import re
+
+# Elements whose content is left exactly as written (style content is minified as CSS).
+_PRESERVED_RE = re.compile(r"(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)", re.S | re.I)
+# Comments, except conditional comments for old IE
+_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.S)
+# HTML and CSS whitespace only: \s would also match non-breaking spaces, which are content
+_SPACES = " \t\n\r\f"
+_SPACE = r"[ \t\n\r\f]"
+_WHITESPACE_RE = re.compile(f"{_SPACE}+")
+# A tag, with any ">" inside quoted attribute values, and the quoted values in it
+_TAG_BODY = r"""(?:"[^"]*"|'[^']*'|[^'">])*>"""
+_TAG_RE = re.compile(f"(<[a-zA-Z/!]{_TAG_BODY})")
+_ATTRIBUTE_VALUE_RE = re.compile(r"""("[^"]*"|'[^']*')""")
+# Whitespace next to these tags is never rendered, so it can be dropped entirely. Around any
+# other (inline) tag a single space is kept, since it separates words.
+_BLOCK_TAGS = (
+    "html|head|body|title|meta|link|base|main|header|footer|nav|section|article|aside|div|p|"
+    "h[1-6]|ul|ol|li|dl|dt|dd|table|thead|tbody|tfoot|tr|td|th|caption|form|fieldset|"
+    "blockquote|figure|figcaption|hr|br|center|pre|!doctype"
+)
+_BLOCK_TAG_RE = re.compile(rf"{_SPACE}*(</?(?:{_BLOCK_TAGS})\b{_TAG_BODY}){_SPACE}*", re.I)
+
+_CSS_STRING_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')", re.S)
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_PUNCTUATION_RE = re.compile(rf"{_SPACE}*([{{}};,>]){_SPACE}*")
+_CSS_COLON_RE = re.compile(f":{_SPACE}+")
+
+def minify_css(css):
+    """
+    Removes comments and insignificant whitespace from a stylesheet. Quoted strings are kept
+    as written, and spaces around + and - are kept because calc() needs them.
+    """
+    css = _CSS_COMMENT_RE.sub("", css)
+    parts = _CSS_STRING_RE.split(css)
+    for i in range(0, len(parts), 2): # Odd indexes are the strings
+        part = _WHITESPACE_RE.sub(" ", parts[i])
+        part = _CSS_PUNCTUATION_RE.sub(r"\1", part)
+        parts[i] = _CSS_COLON_RE.sub(":", part)
+    return "".join(parts).replace(";}", "}").strip(_SPACES)
+
+def _collapse(text, keep):
+    """Collapses whitespace in text except in the parts matched by the (capturing) keep pattern."""
+    parts = keep.split(text)
+    for i in range(0, len(parts), 2): # Odd indexes are the kept parts
+        parts[i] = _WHITESPACE_RE.sub(" ", parts[i])
+    return "".join(parts)
+
+def _minify_markup(html):
+    html = _COMMENT_RE.sub("", html)
+    parts = _TAG_RE.split(html)
+    for i in range(1, len(parts), 2): # Odd indexes are tags; their attribute values are kept
+        parts[i] = _collapse(parts[i], _ATTRIBUTE_VALUE_RE)
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE_RE.sub(" ", parts[i])
+    html = "".join(parts)
+    return _BLOCK_TAG_RE.sub(r"\1", html)
+
+def minify_html(html):
+    """
+    Removes comments and collapses whitespace in an HTML page without changing how it renders:
+    runs of whitespace become a single space, whitespace next to block-level tags is dropped,
+    and attribute values, non-breaking spaces and the content of pre, textarea and script
+    elements are left untouched.
+    """
+    output = []
+    position = 0
+    after_block = False
+    for match in _PRESERVED_RE.finditer(html):
+        markup = _minify_markup(html[position:match.start()])
+        output.append(markup.lstrip(_SPACES) if after_block else markup)
+        opening, tag, content, closing = match.groups()
+        if tag.lower() == "style":
+            content = minify_css(content)
+        output.append(_minify_markup(opening) + content + closing)
+        # Whitespace after a closing </pre> or </style> is not rendered either
+        after_block = tag.lower() in ("pre", "style")
+        position = match.end()
+    markup = _minify_markup(html[position:])
+    output.append(markup.lstrip(_SPACES) if after_block else markup)
+    return "".join(output).strip(_SPACES)
@@ -0,0 +1,52 @@
+import io
+import os
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+
+# Per-process state set up once by the pool initializer, so large shared arguments
+# (the chapter list, prefs) are pickled once per worker rather than once per task.
+_worker_state = {}
+
+def resolve_jobs(jobs):
+    """Normalises a jobs option: None means serial, 0 or less means one job per CPU."""
+    if jobs is None:
+        return 1
+    jobs = int(jobs)
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def _init_worker(func, shared_args):
+    _worker_state["func"] = func
+    _worker_state["shared_args"] = shared_args
+
+def _run_job(item):
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            result = _worker_state["func"](item, *_worker_state["shared_args"])
+        return result, None, output.getvalue()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", output.getvalue()
+
+def run_jobs(func, items, shared_args=(), jobs=None):
+    """
+    Calls func(item, *shared_args) for every item, across a process pool when jobs > 1.
+    func must be a module-level function so it can be pickled.
+    Returns a list of (result, error, output) tuples in the same order as items, where error
+    is a message string if that call raised and output is anything it printed (parallel runs
+    only; serial runs print directly).
+    """
+    workers = min(resolve_jobs(jobs), len(items))
+    if workers <= 1:
+        results = []
+        for item in items:
+            try:
+                results.append((func(item, *shared_args), None, ""))
+            except Exception as e:
+                results.append((None, f"{type(e).__name__}: {e}", ""))
+        return results
+
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(func, shared_args)) as executor:
+        return list(executor.map(_run_job, items, chunksize=chunksize))
@@ -0,0 +1,128 @@
+import os
+import gzip
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from core.src.parallel import resolve_jobs
+from core.src.build_manifest import hash_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Text assets worth serving precompressed (gzip_static / brotli_static / zstd)
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt"}
+COMPRESSED_SUFFIXES = {".gz", ".br", ".zst"}
+
+def _gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+def _zstd(data):
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+def available_encoders():
+    """Returns (suffix, compress function) for every encoder whose library is installed."""
+    encoders = [(".gz", _gzip)]
+    if brotli is not None:
+        encoders.append((".br", _brotli))
+    if zstandard is not None:
+        encoders.append((".zst", _zstd))
+    return encoders
+
+def _source_record(path, record):
+    """
+    The size, modification time and content hash of path, as stored in the precompress state.
+    The file is only hashed when its size or modification time differ from record's.
+    """
+    stat = os.stat(path)
+    if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+        return record
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_file(path)}
+
+def compress_file(path, encoders, record=None):
+    """
+    Writes each compressed sibling of path that is missing or was made from other content.
+    record is the state (see _source_record) of the content the existing siblings were made
+    from, if known. Returns (the state of path, number of siblings written).
+    """
+    current = _source_record(path, record)
+    if record and record.get("hash") == current["hash"]:
+        stale = [(suffix, encode) for suffix, encode in encoders if not os.path.exists(path + suffix)]
+    else:
+        stale = list(encoders)
+    if not stale:
+        return current, 0
+    with open(path, "rb") as f:
+        data = f.read()
+    for suffix, encode in stale:
+        tmp_path = path + suffix + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encode(data))
+        os.replace(tmp_path, path + suffix)
+    return current, len(stale)
+
+def _is_compressed_sibling(path):
+    base, ext = os.path.splitext(path)
+    return ext in COMPRESSED_SUFFIXES and os.path.splitext(base)[1] in COMPRESSIBLE_EXTENSIONS
+
+def remove_compressed_siblings(root_dir):
+    """Deletes every compressed sibling under root_dir. Returns how many were removed."""
+    removed = 0
+    for dirpath, _, filenames in os.walk(root_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if _is_compressed_sibling(path):
+                os.remove(path)
+                removed += 1
+    return removed
+
+def precompress_tree(root_dir, jobs=None, state=None):
+    """
+    Writes .gz, .br and .zst siblings next to every text asset under root_dir, so a front-end
+    server can serve them without compressing on each request. Only files whose content
+    differs from what their siblings were made from are compressed, the work is spread over a
+    thread pool (the compressors release the GIL), and siblings whose source file no longer
+    exists are removed.
+    state (kept in the build manifest) maps each file's path under root_dir to the size,
+    modification time and content hash its siblings were made from; it is read and updated
+    in place. Without it every file is compressed.
+    Returns the number of compressed files written.
+    """
+    encoders = available_encoders()
+    if brotli is None or zstandard is None:
+        logging.warning("Brotli and/or zstandard are not installed; writing only the encodings that are available.")
+    state = {} if state is None else state
+
+    sources = []
+    for dirpath, _, filenames in os.walk(root_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if _is_compressed_sibling(path):
+                if not os.path.exists(os.path.splitext(path)[0]):
+                    os.remove(path)
+            elif os.path.splitext(name)[1] in COMPRESSIBLE_EXTENSIONS:
+                sources.append(os.path.relpath(path, root_dir))
+
+    def compress(source):
+        return compress_file(os.path.join(root_dir, source), encoders, state.get(source))
+
+    written = 0
+    with ThreadPoolExecutor(max_workers=resolve_jobs(jobs if jobs is not None else 0)) as executor:
+        for source, (record, count) in zip(sources, executor.map(compress, sources)):
+            state[source] = record
+            written += count
+    for source in set(state) - set(sources):
+        del state[source]
+    return written
@@ -0,0 +1,212 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from core.src.utils import load_json, save_json
+from core.src.parallel import run_jobs
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+PROFILE_VERSION = 1
+
+def get_profile_path(project_path):
+    return os.path.join(project_path, "data", "build_profile.json")
+
+def load_profile_report(project_path, target):
+    """Returns the latest profile report for a target ("html", "epub", "pdf"), or None."""
+    report = load_json(get_profile_path(project_path)).get(target)
+    return report if isinstance(report, dict) and report.get("version") == PROFILE_VERSION else None
+
+def _io_counters():
+    """Returns the bytes this process has read and written so far, or None where unavailable."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _children_cpu():
+    """CPU time used by finished child processes, e.g. a build's worker pool."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+# Peak traced memory of each open measurement. tracemalloc has a single peak counter, so
+# opening a nested measurement folds the peak so far into its parent before resetting it.
+_open_peaks = []
+
+class _Measurement:
+    """Wall time, CPU time, bytes read and written, and tracemalloc peak between start() and stop()."""
+    def start(self):
+        if tracemalloc.is_tracing():
+            if _open_peaks:
+                _open_peaks[-1] = max(_open_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        _open_peaks.append(0)
+        self.io = _io_counters()
+        self.cpu = time.process_time() + _children_cpu()
+        self.wall = time.perf_counter()
+        return self
+
+    def stop(self):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() + _children_cpu() - self.cpu
+        io = _io_counters()
+        peak = _open_peaks.pop()
+        if tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            if _open_peaks:
+                _open_peaks[-1] = max(_open_peaks[-1], peak)
+        return {
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "bytes_read": io[0] - self.io[0] if io and self.io else None,
+            "bytes_written": io[1] - self.io[1] if io and self.io else None,
+            "peak_memory_bytes": peak if tracemalloc.is_tracing() else None,
+        }
+
+def profile_call(item, func, *shared_args):
+    """
+    run_jobs-compatible wrapper that calls func(item, *shared_args) and measures it, tracing
+    memory for the call if nothing else is (as in a worker process). Returns (result, measurements).
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    measurement = _Measurement().start()
+    try:
+        result = func(item, *shared_args)
+    finally:
+        measurements = measurement.stop()
+        if started_tracing:
+            tracemalloc.stop()
+    return result, measurements
+
+class BuildProfile:
+    """
+    Per-stage and per-chapter measurements for one build of a target. Stages are consecutive:
+    stage() ends the current one and starts the next, and finish() ends the last and saves the
+    report to data/build_profile.json. A disabled profile measures nothing and saves nothing,
+    so builders can call it unconditionally.
+
+    Stage figures cover the building process and, for CPU time, any worker processes that
+    finished during the stage; chapters rendered in a worker are measured in that worker.
+    """
+    def __init__(self, project_path, target, enabled=True):
+        self.project_path = project_path
+        self.target = target
+        self.enabled = enabled
+        self.stages = []
+        self.chapters = []
+        self.report = None
+        self._current = None
+        self._owns_tracing = False
+        if enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            self.started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            self._total = _Measurement().start()
+
+    def stage(self, name):
+        """Ends the current stage, if any, and starts measuring the named one."""
+        if not self.enabled:
+            return
+        self._end_stage()
+        self._current = (name, _Measurement().start())
+
+    def _end_stage(self):
+        if self._current:
+            name, measurement = self._current
+            self.stages.append({"name": name, **measurement.stop()})
+            self._current = None
+
+    @contextmanager
+    def chapter(self, number):
+        """Measures the work done for one chapter inside the current stage."""
+        if not self.enabled:
+            yield
+            return
+        measurement = _Measurement().start()
+        try:
+            yield
+        finally:
+            self.chapters.append({"number": number, "stage": self._stage_name(), **measurement.stop()})
+
+    def _stage_name(self):
+        return self._current[0] if self._current else None
+
+    def run_jobs(self, func, items, shared_args=(), jobs=None, chapter_number=None):
+        """
+        run_jobs that also records each item as a chapter (chapter_number(item) gives its
+        number). Returns the same (result, error, output) list.
+        """
+        if not self.enabled:
+            return run_jobs(func, items, shared_args, jobs)
+        results = []
+        for item, (result, error, output) in zip(items, run_jobs(profile_call, items, (func,) + tuple(shared_args), jobs)):
+            if error is None:
+                result, measurements = result
+                number = chapter_number(item) if chapter_number else len(self.chapters) + 1
+                self.chapters.append({"number": number, "stage": self._stage_name(), **measurements})
+            results.append((result, error, output))
+        return results
+
+    def finish(self):
+        """Ends the last stage and saves the report. Returns the report, or None if disabled."""
+        if not self.enabled:
+            return None
+        self._end_stage()
+        self.report = {
+            "version": PROFILE_VERSION,
+            "target": self.target,
+            "started": self.started,
+            "total": self._total.stop(),
+            "stages": self.stages,
+            "chapters": self.chapters,
+        }
+        if self._owns_tracing:
+            tracemalloc.stop()
+        path = get_profile_path(self.project_path)
+        reports = load_json(path)
+        reports[self.target] = self.report
+        save_json(path, reports)
+        return self.report
+
+    def discard(self):
+        """Abandons a profile whose build failed, without saving a report."""
+        if not self.enabled:
+            return
+        _open_peaks.clear()
+        self._current = None
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+def _format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+def profile_summary(report):
+    """One-line summary of a profile report for the console and the web UI."""
+    total = report["total"]
+    parts = [f"{total['wall_seconds']:.2f} s wall", f"{total['cpu_seconds']:.2f} s CPU"]
+    if total["peak_memory_bytes"] is not None:
+        parts.append(f"peak {_format_bytes(total['peak_memory_bytes'])}")
+    if total["bytes_written"] is not None:
+        parts.append(f"{_format_bytes(total['bytes_read'])} read, {_format_bytes(total['bytes_written'])} written")
+    summary = f"{report['target'].upper()} profile: " + ", ".join(parts)
+    if report["stages"]:
+        slowest = max(report["stages"], key=lambda stage: stage["wall_seconds"])
+        summary += f"; slowest stage: {slowest['name']} ({slowest['wall_seconds']:.2f} s)"
+    if report["chapters"]:
+        slowest = max(report["chapters"], key=lambda chapter: chapter["wall_seconds"])
+        summary += f"; slowest chapter: {slowest['number']} ({slowest['wall_seconds']:.2f} s)"
+    return summary + ". Full report in data/build_profile.json."
@@ -0,0 +1,168 @@
+import os
+import shutil
+import logging
+from datetime import datetime, timezone
+from core.src.utils import load_json, save_json
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+STAGING_SUFFIX = ".staging"
+# Name given to a pre-existing real public/ directory when it is first moved into releases/;
+# it sorts before every timestamped release so it is the first to be pruned.
+LEGACY_RELEASE = "00000000T000000000000Z"
+
+def get_releases_path(project_path):
+    return os.path.join(project_path, "releases")
+
+def get_public_path(project_path):
+    return os.path.join(project_path, "public")
+
+def get_release_state_path(project_path, release):
+    return os.path.join(project_path, "data", "releases", f"{release}.json")
+
+def save_release_state(project_path, release, state):
+    """Keeps the build manifest records that describe a release's files, for rollback_release."""
+    save_json(get_release_state_path(project_path, release), state)
+
+def load_release_state(project_path, release):
+    """The records saved for a release by save_release_state, or None if there are none."""
+    return load_json(get_release_state_path(project_path, release)) or None
+
+def list_releases(project_path):
+    """Returns the names of the published releases, oldest first."""
+    releases_path = get_releases_path(project_path)
+    if not os.path.isdir(releases_path):
+        return []
+    return sorted(
+        name for name in os.listdir(releases_path)
+        if not name.endswith(STAGING_SUFFIX) and os.path.isdir(os.path.join(releases_path, name))
+    )
+
+def current_release(project_path):
+    """Returns the name of the release public/ points at, or None if public/ is not a release link."""
+    public = get_public_path(project_path)
+    if not os.path.islink(public):
+        return None
+    return os.path.basename(os.path.normpath(os.readlink(public)))
+
+def symlinks_supported(project_path):
+    """True if directory symlinks can be created in the project (not always the case on Windows)."""
+    probe = os.path.join(project_path, f".symlink-probe-{os.getpid()}")
+    try:
+        os.symlink(".", probe, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        return False
+    os.remove(probe)
+    return True
+
+def _link_tree(src, dst):
+    """Recreates src under dst with every file hard-linked (copied where linking is not possible)."""
+    for dirpath, _, filenames in os.walk(src):
+        target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in filenames:
+            src_file = os.path.join(dirpath, name)
+            dst_file = os.path.join(target_dir, name)
+            try:
+                os.link(src_file, dst_file)
+            except OSError:
+                shutil.copy2(src_file, dst_file)
+
+def stage_release(project_path):
+    """
+    Creates a staging directory for a new release, pre-populated with hard links to every file
+    of the currently published site, so a build only has to replace the files that changed.
+    Writers must replace files (write a temporary file and os.replace it) rather than rewrite
+    them in place, or they would modify the previous release through the shared link.
+    """
+    releases_path = get_releases_path(project_path)
+    os.makedirs(releases_path, exist_ok=True)
+
+    # Leftovers from builds that crashed before publishing
+    for name in os.listdir(releases_path):
+        if name.endswith(STAGING_SUFFIX):
+            shutil.rmtree(os.path.join(releases_path, name), ignore_errors=True)
+
+    release_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    staging = os.path.join(releases_path, release_id + STAGING_SUFFIX)
+    public = get_public_path(project_path)
+    if os.path.isdir(public):
+        _link_tree(public, staging)
+    else:
+        os.makedirs(staging)
+    return staging
+
+def _tree_files(root):
+    """Maps each file under root, by relative path, to its (device, inode)."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            files[os.path.relpath(path, root)] = (stat.st_dev, stat.st_ino)
+    return files
+
+def release_unchanged(project_path, staging):
+    """
+    True if a staged build left every file of the live site in place (still hard-linked to
+    it), and wrote or removed nothing, so publishing it would only use up a rollback point.
+    """
+    public = get_public_path(project_path)
+    return os.path.isdir(public) and _tree_files(staging) == _tree_files(public)
+
+def discard_release(staging):
+    shutil.rmtree(staging, ignore_errors=True)
+
+def _point_public_at(project_path, release):
+    """Atomically switches the public/ symlink to the named release."""
+    public = get_public_path(project_path)
+    swap_link = public + ".swap"
+    if os.path.lexists(swap_link):
+        os.remove(swap_link)
+    os.symlink(os.path.join("releases", release), swap_link, target_is_directory=True)
+    os.replace(swap_link, public)
+
+def publish_release(project_path, staging, keep=3):
+    """
+    Makes a staged build live with a single atomic swap of the public/ symlink, then deletes
+    all but the newest `keep` releases. Returns the name of the published release.
+    """
+    release = os.path.basename(staging)[:-len(STAGING_SUFFIX)]
+    os.rename(staging, os.path.join(get_releases_path(project_path), release))
+
+    public = get_public_path(project_path)
+    if os.path.isdir(public) and not os.path.islink(public):
+        # First staged publish: keep the old real directory as the oldest release
+        legacy = os.path.join(get_releases_path(project_path), LEGACY_RELEASE)
+        if os.path.exists(legacy):
+            shutil.rmtree(legacy)
+        os.rename(public, legacy)
+        logging.info(f"Moved existing public/ directory to {legacy}")
+
+    _point_public_at(project_path, release)
+    prune_releases(project_path, keep)
+    return release
+
+def prune_releases(project_path, keep):
+    """Deletes the oldest releases beyond `keep`, never the one currently published."""
+    live = current_release(project_path)
+    releases = list_releases(project_path)
+    for release in releases[:max(0, len(releases) - max(1, keep))]:
+        if release != live:
+            shutil.rmtree(os.path.join(get_releases_path(project_path), release), ignore_errors=True)
+            if os.path.exists(get_release_state_path(project_path, release)):
+                os.remove(get_release_state_path(project_path, release))
+
+def rollback_release(project_path):
+    """
+    Points public/ back at the release published before the current one.
+    Returns the name of the release now live, or None if there is nothing to roll back to.
+    """
+    live = current_release(project_path)
+    releases = list_releases(project_path)
+    if live not in releases or releases.index(live) == 0:
+        return None
+    previous = releases[releases.index(live) - 1]
+    _point_public_at(project_path, previous)
+    return previous
@@ -0,0 +1,144 @@
+import os
+import re
+import json
+from collections import Counter
+from core.src.importer import html_to_plain_text
+from core.src.fileio import replace_file
+from core.src.build_manifest import hash_source, hash_value
+from core.src.utils import load_json
+
+# Bump when tokenization or the shard format changes, so the index is rebuilt from scratch.
+SEARCH_INDEX_VERSION = 1
+
+# Letters and digits only; the search page's tokenizer must match this.
+TOKEN_RE = re.compile(r"[^\W_]+")
+MIN_TERM_LENGTH = 2
+
+def get_search_cache_path(project_path):
+    return os.path.join(project_path, "cache", "search")
+
+def tokenize(text):
+    """Returns {term: occurrences} for a piece of plain text."""
+    return dict(Counter(term for term in TOKEN_RE.findall(text.lower()) if len(term) >= MIN_TERM_LENGTH))
+
+def shard_key(term):
+    """
+    Names the shard a term is stored in: its first two characters, or for terms that start
+    outside ASCII, "u" and the hex code point of the first character (safe in any URL).
+    """
+    prefix = term[:2]
+    return prefix if prefix.isascii() else f"u{ord(term[0]):x}"
+
+def chapter_terms(project_path, fragment_path, fragment_hash):
+    """
+    Returns the term counts for a chapter fragment. Each fragment is tokenized once: the result
+    is cached under cache/search/ by content hash, so it is reused until the chapter changes.
+    """
+    cache_path = os.path.join(get_search_cache_path(project_path), f"{fragment_hash}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    with open(fragment_path, "r", encoding="utf-8") as f:
+        terms = tokenize(html_to_plain_text(f.read()))
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with replace_file(cache_path) as f:
+        f.write(json.dumps(terms, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return terms
+
+def _cached_terms(project_path, fragment_hash):
+    """Term counts from the cache only, or None if they are not there."""
+    cache_path = os.path.join(get_search_cache_path(project_path), f"{fragment_hash}.json")
+    return load_json(cache_path) if os.path.exists(cache_path) else None
+
+def _write_json(path, data):
+    with replace_file(path) as f:
+        f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+
+def update_search_index(project_path, search_dir, docs, manifest, force=False):
+    """
+    Maintains a sharded inverted index of the chapters in search_dir for the site's search page.
+    docs is a list of (number, label, url, fragment_path) for the chapters to index.
+
+    Each shard, <key>.json, maps the terms under one shard_key to [[chapter, count], ...] and
+    chapters.json maps chapter numbers to [label, url]. Only chapters whose fragment changed
+    since the last build are tokenized, and only the shards holding their old or new terms are
+    rewritten. Falls back to a full rebuild when the previous index can't be trusted.
+    Returns the number of shard files written or removed.
+    """
+    state = manifest.get("search") or {}
+    hashes = {str(num): hash_source(manifest, path) for num, _, _, path in docs}
+    paths = {str(num): path for num, _, _, path in docs}
+
+    previous = state.get("chapters")
+    if force or state.get("version") != SEARCH_INDEX_VERSION or previous is None or not os.path.isdir(search_dir):
+        previous = None
+    changed = set(hashes) if previous is None else {
+        num for num in set(hashes) | set(previous) if hashes.get(num) != previous.get(num)
+    }
+
+    # Terms each changed chapter used to have (to remove) and has now (to add)
+    old_terms = {}
+    if previous is not None:
+        for num in changed:
+            if previous.get(num) is not None:
+                old_terms[num] = _cached_terms(project_path, previous[num])
+                if old_terms[num] is None:
+                    # Cache was cleared: rebuild everything rather than leave stale postings
+                    return update_search_index(project_path, search_dir, docs, manifest, force=True)
+    new_terms = {
+        num: chapter_terms(project_path, paths[num], hashes[num])
+        for num in changed if hashes.get(num) is not None
+    }
+
+    os.makedirs(search_dir, exist_ok=True)
+    written = 0
+    if previous is None:
+        # Full rebuild: group every term into its shard and drop shards that are no longer used
+        shards = {}
+        for num, terms in new_terms.items():
+            for term, count in terms.items():
+                shards.setdefault(shard_key(term), {}).setdefault(term, []).append([int(num), count])
+        for name in os.listdir(search_dir):
+            key, ext = os.path.splitext(name)
+            if ext == ".json" and key != "chapters" and key not in shards:
+                os.remove(os.path.join(search_dir, name))
+                written += 1
+    else:
+        keys = {shard_key(term) for terms in list(old_terms.values()) + list(new_terms.values()) for term in terms}
+        removed = {int(num) for num in changed}
+        shards = {}
+        for key in keys:
+            shard = load_json(os.path.join(search_dir, f"{key}.json"))
+            for term in list(shard):
+                shard[term] = [posting for posting in shard[term] if posting[0] not in removed]
+            shards[key] = shard
+        for num, terms in new_terms.items():
+            for term, count in terms.items():
+                shards[shard_key(term)].setdefault(term, []).append([int(num), count])
+
+    for key, shard in shards.items():
+        shard = {term: sorted(postings) for term, postings in shard.items() if postings}
+        shard_path = os.path.join(search_dir, f"{key}.json")
+        if shard:
+            _write_json(shard_path, shard)
+        elif os.path.exists(shard_path):
+            os.remove(shard_path)
+        written += 1
+
+    # Titles and links for the results list
+    listing = {str(num): [label, url] for num, label, url, _ in docs if hashes[str(num)] is not None}
+    listing_hash = hash_value(listing)
+    chapters_path = os.path.join(search_dir, "chapters.json")
+    if previous is None or state.get("listing") != listing_hash or not os.path.exists(chapters_path):
+        _write_json(chapters_path, listing)
+        written += 1
+
+    manifest["search"] = {
+        "version": SEARCH_INDEX_VERSION,
+        "chapters": {num: digest for num, digest in hashes.items() if digest is not None},
+        "listing": listing_hash,
+    }
+    return written
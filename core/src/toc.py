@@ -0,0 +1,43 @@
+TOC_MODES = ("single", "paged", "volume")
+DEFAULT_TOC_PAGE_SIZE = 100
+# Chapters listed on the landing page when the table of contents is split
+LATEST_CHAPTER_COUNT = 10
+
+def _range_label(chapters):
+    first, last = chapters[0]["number"], chapters[-1]["number"]
+    return f"Chapter {first}" if first == last else f"Chapters {first}–{last}"
+
+def split_toc(chapters, features):
+    """
+    Splits the table of contents into pages according to the display features:
+    "paged" makes pages of toc_page_size chapters, "volume" starts a new page whenever the
+    chapters' "volume" field changes, and "single" (the default) returns no pages at all.
+    Returns a list of {"number", "label", "chapters"} dicts, numbered from 1.
+    """
+    mode = features.get("toc_mode", "single")
+    if mode not in ("paged", "volume") or not chapters:
+        return []
+
+    if mode == "paged":
+        try:
+            size = max(1, int(features.get("toc_page_size", DEFAULT_TOC_PAGE_SIZE)))
+        except (TypeError, ValueError):
+            size = DEFAULT_TOC_PAGE_SIZE
+        groups = [(None, chapters[i:i + size]) for i in range(0, len(chapters), size)]
+    else:
+        groups = []
+        for ch in chapters:
+            volume = ch.get("volume") or None
+            if groups and groups[-1][0] == volume:
+                groups[-1][1].append(ch)
+            else:
+                groups.append((volume, [ch]))
+
+    return [
+        {"number": i, "label": volume or _range_label(group), "chapters": group}
+        for i, (volume, group) in enumerate(groups, start=1)
+    ]
+
+def latest_chapters(chapters, count=LATEST_CHAPTER_COUNT):
+    """Returns the `count` highest-numbered chapters, newest first."""
+    return sorted(chapters, key=lambda ch: ch.get("number", 0), reverse=True)[:count]
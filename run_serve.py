@@ -0,0 +1,18 @@
+# run_serve.py
+import os
+import argparse
+from web.src.manage_projects import get_project_path
+from web.src.preview_server import serve
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preview a project's static site with live reload.")
+    parser.add_argument("project", help="Project slug name")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", "-p", type=int, default=8000, help="Port to listen on")
+    args = parser.parse_args()
+
+    project_path = get_project_path(args.project)
+    if not os.path.isdir(project_path):
+        print(f"❌ Project '{args.project}' not found in /projects/")
+    else:
+        serve(project_path, args.host, args.port)
@@ -5,6 +5,7 @@ from web.src import chapters as web_chapters
 from web.src import layout_manager as web_layout_manager
 from core.src.utils import load_prefs, save_prefs # For managing blurb preferences and content file
 from web.src.chapter_utils import get_includes_path # To get the project's includes path
+from core.src.toc import TOC_MODES, DEFAULT_TOC_PAGE_SIZE
 
 layout_bp = Blueprint('layout_bp', __name__)
 
@@ -27,6 +28,8 @@ def html_layout(slug):
         prefs = load_prefs(project['project_path'])
         display_features = prefs.get('display_features', {})
         
+        toc_mode = request.form.get('toc_mode', 'single')
+
         # Collect all checkbox values
         updated_display_features = {
             "use_chapter_titles": 'use_chapter_titles' in request.form,
@@ -40,7 +43,9 @@ def html_layout(slug):
             "social_links": 'social_links' in request.form,
             "copyright": 'copyright' in request.form,
             "license": 'license' in request.form,
-            "html_include_blurb": 'html_include_blurb' in request.form # New blurb flag
+            "html_include_blurb": 'html_include_blurb' in request.form, # New blurb flag
+            "toc_mode": toc_mode if toc_mode in TOC_MODES else "single",
+            "toc_page_size": max(1, request.form.get('toc_page_size', DEFAULT_TOC_PAGE_SIZE, type=int))
         }
 
         # Handle blurb content file
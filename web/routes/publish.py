@@ -3,12 +3,26 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from web.src.chapters import get_project_details, get_project_path, get_chapters_data
 from core.src.utils import load_prefs
 from cli.src.chapter_utils import ensure_cover_image
-from web.src.html_output import build_html
-from web.src.epub_output import build_epub
-from web.src.pdf_output import build_pdf
+from web.src.html_output import build_html, rollback_html
+from web.src.publish_options import get_publish_options, update_publish_options
+from web.src.epub_output import build_epub, build_chapter_epubs
+from web.src.pdf_output import build_pdf, build_chapter_pdfs
+from core.src.profiling import load_profile_report, profile_summary
 
 publish_bp = Blueprint('publish_bp', __name__)
 
+def _flash_profile(project_path, target):
+    report = load_profile_report(project_path, target)
+    if report:
+        flash(profile_summary(report), "info")
+
+def _flash_chapter_downloads(summary, label):
+    if summary is None:
+        return
+    flash(f"Per-chapter {label} downloads: {len(summary['written'])} built, {len(summary['skipped'])} unchanged"
+          + (f", {len(summary['failed'])} failed" if summary["failed"] else "")
+          + ". Publish the HTML site to put them online.", "error" if summary["failed"] else "info")
+
 @publish_bp.route("/project/<slug>/publish", methods=["GET", "POST"])
 def publish_output_menu(slug):
     project_path = get_project_path(slug)
@@ -24,8 +38,8 @@ def publish_output_menu(slug):
         try:
             ensure_cover_image(project_path, os.path.join(project_path, "includes"))
             if action == "publish_html":
-                build_html(project_path, prefs, chapters_data)
-                flash("HTML publishing complete.", "success")
+                summary = build_html(project_path, prefs, chapters_data)
+                flash(f"HTML publishing complete ({len(summary['written'])} written, {len(summary['skipped'])} unchanged).", "success")
             elif action == "publish_epub":
                 build_epub(project_path, prefs, chapters_data)
                 flash("EPUB publishing complete.", "success")
@@ -54,17 +68,41 @@ def publish_html(slug):
         return redirect(url_for('projects_bp.manage_projects'))
 
     if request.method == "POST":
+        update_publish_options(project_path, request.form)
         prefs = load_prefs(project_path)
         chapters_data = get_chapters_data(slug)
         try:
             ensure_cover_image(project_path, os.path.join(project_path, "includes"))
-            build_html(project_path, prefs, chapters_data)
-            flash("Static HTML Web Site publishing complete.", "success")
+            profile = 'profile' in request.form
+            summary = build_html(project_path, prefs, chapters_data, force='force' in request.form, jobs=request.form.get("jobs", type=int), profile=profile)
+            flash(f"Static HTML Web Site publishing complete ({len(summary['written'])} written, {len(summary['skipped'])} unchanged).", "success")
+            if summary["failed"]:
+                flash(f"{len(summary['failed'])} chapter page(s) failed to render: {', '.join(summary['failed'])}", "error")
+            if profile:
+                _flash_profile(project_path, "html")
         except Exception as e:
             flash(f"Error during HTML publishing: {e}", "error")
         return redirect(url_for('publish_bp.publish_html', slug=slug))
 
-    return render_template("publish_html.html", project=project_details)
+    return render_template("publish_html.html", project=project_details, publish_options=get_publish_options(project_details))
+
+@publish_bp.route("/project/<slug>/publish/html/rollback", methods=["POST"])
+def rollback_html_release(slug):
+    project_path = get_project_path(slug)
+    project_details = get_project_details(slug)
+    if not project_details:
+        flash("Project not found.", "error")
+        return redirect(url_for('projects_bp.manage_projects'))
+
+    try:
+        release = rollback_html(project_path)
+        if release:
+            flash(f"Rolled back the published site to release {release}.", "success")
+        else:
+            flash("There is no earlier release to roll back to.", "info")
+    except Exception as e:
+        flash(f"Error during rollback: {e}", "error")
+    return redirect(url_for('publish_bp.publish_html', slug=slug))
 
 @publish_bp.route("/project/<slug>/publish/epub", methods=["GET", "POST"])
 def publish_epub(slug):
@@ -79,8 +117,15 @@ def publish_epub(slug):
         chapters_data = get_chapters_data(slug)
         try:
             ensure_cover_image(project_path, os.path.join(project_path, "includes"))
-            build_epub(project_path, prefs, chapters_data)
+            profile = 'profile' in request.form
+            jobs = request.form.get("jobs", type=int)
+            build_epub(project_path, prefs, chapters_data, profile=profile, jobs=jobs, stream='stream' in request.form,
+                       reproducible='reproducible' in request.form, epub3='epub3' in request.form)
             flash("EPUB publishing complete.", "success")
+            if profile:
+                _flash_profile(project_path, "epub")
+            if 'chapter_downloads' in request.form:
+                _flash_chapter_downloads(build_chapter_epubs(project_path, prefs, chapters_data, jobs=jobs), "EPUB")
         except Exception as e:
             flash(f"Error during EPUB publishing: {e}", "error")
         return redirect(url_for('publish_bp.publish_epub', slug=slug))
@@ -100,8 +145,13 @@ def publish_pdf(slug):
         chapters_data = get_chapters_data(slug)
         try:
             ensure_cover_image(project_path, os.path.join(project_path, "includes"))
-            build_pdf(project_path, prefs, chapters_data)
+            profile = 'profile' in request.form
+            build_pdf(project_path, prefs, chapters_data, profile=profile)
             flash("PDF publishing complete.", "success")
+            if profile:
+                _flash_profile(project_path, "pdf")
+            if 'chapter_downloads' in request.form:
+                _flash_chapter_downloads(build_chapter_pdfs(project_path, prefs, chapters_data, jobs=request.form.get("jobs", type=int)), "PDF")
         except Exception as e:
             flash(f"Error during PDF publishing: {e}", "error")
         return redirect(url_for('publish_bp.publish_pdf', slug=slug))
@@ -0,0 +1,77 @@
+import os
+from core.src.parallel import run_jobs
+from core.src.chapter_assets import collect_chapter_assets
+from core.src.chapter_nav import published_chapters
+from core.src.build_manifest import load_build_manifest, save_build_manifest, hash_source, hash_value
+
+def get_download_dir(project_path):
+    """Where per-chapter downloads are built; build_html publishes them to public/download/."""
+    return os.path.join(project_path, "download")
+
+def chapter_download_name(prefs, chapter, extension):
+    """The file name the chapter pages link to (see RenderContext.has_download)."""
+    slug = prefs.get("story_title", "").lower().replace(" ", "_")
+    return f"{slug}_chapter_{chapter['number']}.{extension}"
+
+def build_chapter_downloads(project_path, prefs, chapters, extension, exclude_key, shared_signature,
+                            func, shared_args=(), jobs=None, force=False):
+    """
+    Builds one download/<slug>_chapter_<N>.<extension> file per chapter by calling
+    func((chapter, output_path, assets), *shared_args) across `jobs` processes, where assets
+    are the includes/ files the chapter text refers to. A chapter is rebuilt only when its
+    text, title, assets or shared_signature (everything func builds from shared_args) changed
+    since the last build, or force is True. Drafts and chapters flagged exclude_key are left
+    out, and files for chapters that no longer qualify are removed.
+    Returns a summary of the written, skipped and failed file names.
+    """
+    download_dir = get_download_dir(project_path)
+    os.makedirs(download_dir, exist_ok=True)
+    manifest = load_build_manifest(project_path)
+    records = manifest.setdefault("chapter_downloads", {})
+    summary = {"written": [], "skipped": [], "failed": []}
+
+    current = set()
+    pending = []
+    for chapter in published_chapters(chapters):
+        fragment = os.path.join(project_path, "includes", f"chapter_{chapter['number']}.html")
+        if chapter.get(exclude_key) or not os.path.exists(fragment):
+            continue
+        name = chapter_download_name(prefs, chapter, extension)
+        current.add(name)
+        fragment_hash = hash_source(manifest, fragment)
+        assets = collect_chapter_assets(project_path, [(fragment, fragment_hash)])
+        signature = hash_value({
+            "shared": shared_signature,
+            "chapter": {key: chapter.get(key) for key in ("number", "title")},
+            "body": fragment_hash,
+            "assets": [(asset, hash_source(manifest, os.path.join(project_path, "includes", asset))) for asset in assets],
+        })
+        output_path = os.path.join(download_dir, name)
+        if not force and records.get(name) == signature and os.path.exists(output_path):
+            summary["skipped"].append(name)
+            continue
+        pending.append(((chapter, output_path, assets), name, signature))
+
+    results = run_jobs(func, [item for item, _, _ in pending], shared_args, jobs)
+    for (item, name, signature), (_, error, output) in zip(pending, results):
+        if output:
+            print(output, end="")
+        if error:
+            print(f"❌ Chapter {item[0]['number']} {extension.upper()} failed: {error}")
+            records.pop(name, None)
+            summary["failed"].append(name)
+        else:
+            records[name] = signature
+            summary["written"].append(name)
+
+    suffix = f".{extension}"
+    for name in [name for name in records if name.endswith(suffix) and name not in current]:
+        stale_path = os.path.join(download_dir, name)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            print(f"🗑️ Removed stale download {name}")
+        del records[name]
+
+    save_build_manifest(project_path, manifest)
+    print(f"✅ Per-chapter {extension.upper()} downloads complete ({len(summary['written'])} written, {len(summary['skipped'])} unchanged).")
+    return summary
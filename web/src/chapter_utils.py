@@ -79,7 +79,7 @@ def add_chapter(project_path, number, title, discussion, import_format, uploaded
     save_chapters(chapters_path, chapters)
     return True, "Chapter added successfully."
 
-def edit_chapter(project_path, chapter_num, new_title, new_discussion, new_import_format, new_exclude_epub, new_exclude_pdf, new_draft, uploaded_file):
+def edit_chapter(project_path, chapter_num, new_title, new_discussion, new_import_format, new_exclude_epub, new_exclude_pdf, new_draft, uploaded_file, new_volume=None):
     chapters_path = get_chapters_path(project_path)
     includes_path = get_includes_path(project_path)
     os.makedirs(includes_path, exist_ok=True)
@@ -94,6 +94,11 @@ def edit_chapter(project_path, chapter_num, new_title, new_discussion, new_impor
             chapters[i]["exclude_from_epub"] = new_exclude_epub
             chapters[i]["exclude_from_pdf"] = new_exclude_pdf
             chapters[i]["draft"] = new_draft
+            if new_volume is not None:
+                if new_volume:
+                    chapters[i]["volume"] = new_volume
+                else:
+                    chapters[i].pop("volume", None)
 
             # Handle file upload if provided
             if uploaded_file:
@@ -61,6 +61,7 @@ def process_edit_chapter(slug, chapter_num, form_data, uploaded_file):
     new_exclude_epub = 'exclude_from_epub' in form_data
     new_exclude_pdf = 'exclude_from_pdf' in form_data
     new_draft = 'draft' in form_data
+    new_volume = form_data.get("volume", "").strip()
 
     if not new_title:
         flash("Chapter title cannot be empty.", "error")
@@ -68,7 +69,7 @@ def process_edit_chapter(slug, chapter_num, form_data, uploaded_file):
 
     success, message = chapter_utils.edit_chapter(
         project_path, chapter_num, new_title, new_discussion, new_import_format,
-        new_exclude_epub, new_exclude_pdf, new_draft, uploaded_file
+        new_exclude_epub, new_exclude_pdf, new_draft, uploaded_file, new_volume
     )
     if success:
         flash(message, "success")
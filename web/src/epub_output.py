@@ -1,16 +1,64 @@
 import os
+import posixpath
 import zipfile
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
+from functools import partial
 import mimetypes
+from xml.sax.saxutils import escape
 import logging
+from core.src.utils import load_prefs, save_prefs
+from core.src.images import cover_variants
+from core.src.chapter_assets import collect_chapter_assets, COMPRESSED_MEDIA_EXTENSIONS
+from core.src.fragment_split import split_fragment
+from core.src.fonts import embedded_fonts, font_face_css
+from core.src.profiling import BuildProfile, profile_summary
+from core.src.epub_archive import EpubArchive, epub_archive, prepare_entry, write_raw_entry, REPRODUCIBLE_DATE_TIME
+from core.src.build_manifest import load_build_manifest, save_build_manifest, hash_value
+from core.src.fileio import replace_file
+from web.src.chapter_downloads import build_chapter_downloads
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def build_epub(project_path, prefs, chapters):
+STREAM_CHUNK_SIZE = 64 * 1024 # Characters of a chapter fragment copied at a time in streaming mode
+# In EPUB 3 mode chapters larger than this are split into several spine documents; e-readers
+# stall on documents much bigger than a few hundred KB
+SPLIT_CHAPTER_BYTES = 256 * 1024
+CHAPTER_EPUB_VERSION = 1 # Bump to rebuild every per-chapter EPUB after a format change
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ" # Of the package date
+FONTS_CSS = "fonts.css" # Stylesheet declaring the embedded fonts, linked from every chapter page
+FONTS_CSS_ITEM = f'<item id="fonts-css" href="{FONTS_CSS}" media-type="text/css"/>'
+# Package files, written after the chapter assets
+PACKAGE_ENTRIES = {"OEBPS/content.opf", "OEBPS/toc.ncx", "OEBPS/nav.xhtml"}
+
+CONTAINER_XML = '''<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>'''
+
+def build_epub(project_path, prefs, chapters, profile=False, jobs=None, stream=False, reproducible=False, epub3=False):
+    """
+    Builds the project's EPUB in public/downloads/. Entries whose content is unchanged since
+    the last build are copied from the previous EPUB without being compressed again, and
+    changed chapters are compressed across `jobs` threads (0 = one per CPU).
+    With stream=True chapters are copied from their fragments in fixed-size chunks instead,
+    so peak memory stays flat however long the book is.
+    With reproducible=True the same sources always produce the same bytes: the book keeps one
+    identifier and date (book_id and book_date in prefs.json, or SOURCE_DATE_EPOCH), and zip
+    entries get a fixed date; an EPUB that would come out identical is not rewritten.
+    With epub3=True the book is an EPUB 3 package with a nav.xhtml table of contents (and the
+    NCX for older readers), and chapters over SPLIT_CHAPTER_BYTES are split between paragraphs
+    into several documents, chapter<N>.html, chapter<N>_2.html and so on.
+    With profile=True each stage and chapter is timed and measured, and the report is saved
+    to data/build_profile.json.
+    """
     project_path = Path(project_path)
+    profiler = BuildProfile(str(project_path), "epub", enabled=profile)
+    profiler.stage("setup")
     epub_prefs = prefs.get("epub_layout", {})
 
     slug = prefs.get("story_title", "untitled").lower().replace(" ", "_")
@@ -18,94 +66,361 @@ def build_epub(project_path, prefs, chapters):
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / f"{slug}.epub"
 
+    manifest = load_build_manifest(project_path)
     try:
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as epub:
+        with epub_archive(str(output_path), manifest.setdefault("epub", {}), output_path.name, reproducible) as epub:
             # Mimetype file
             epub.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
 
             # META-INF/container.xml
-            epub.writestr("META-INF/container.xml", '''<?xml version="1.0"?>
-<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
-  <rootfiles>
-    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
-  </rootfiles>
-</container>''')
-
-            manifest_items = []
-            spine_items = []
-            toc_navpoints = []
-
-            # Chapters
-            for i, chapter in enumerate(chapters, start=1):
-                if chapter.get("exclude_from_epub"):
-                    continue
-
-                num = chapter["number"]
-                title = chapter["title"]
-                filename = f"chapter{i}.html"
-                
-                chapter_content_path = project_path / "includes" / f"chapter_{num}.html"
-                if not chapter_content_path.exists():
-                    logging.warning(f"Chapter content for chapter {num} not found at {chapter_content_path}. Skipping.")
-                    continue
-
-                body = chapter_content_path.read_text(encoding="utf-8")
-
-                html = get_chapter_html(title, body)
-                epub.writestr(f"OEBPS/{filename}", html)
-                manifest_items.append(f'<item id="chap{i}" href="{filename}" media-type="application/xhtml+xml"/>')
-                spine_items.append(f'<itemref idref="chap{i}"/>')
-                
-                if epub_prefs.get("generate_toc", True):
-                    toc_navpoints.append(f'''
-              <navPoint id="navPoint-{i}" playOrder="{i}">
-                <navLabel><text>{title}</text></navLabel>
-                <content src="{filename}"/>
-              </navPoint>''')
+            epub.writestr("META-INF/container.xml", CONTAINER_XML)
 
-            # Cover Image
-            if epub_prefs.get("cover_image", True):
-                cover_image_path_str = prefs.get("cover_image")
-                if cover_image_path_str:
-                    cover_image_path = project_path / "includes" / cover_image_path_str
-                    if cover_image_path.exists():
-                        mimetype, _ = mimetypes.guess_type(str(cover_image_path))
-                        if mimetype:
-                            image_filename = "cover." + mimetype.split("/")[1]
-                            epub.write(str(cover_image_path), f"OEBPS/images/{image_filename}")
-                            manifest_items.append(f'<item id="cover-image" href="images/{image_filename}" media-type="{mimetype}"/>')
-                            # spine_items.insert(0, '<itemref idref="cover-image"/>') # This can cause issues with some readers
+            # One compact (index, title, part count) record per chapter, in spine order. The OPF,
+            # NCX and nav are generated from these, so memory use does not grow with the book's text.
+            chapter_records = []
+            resource_items = [] # Manifest items for the fonts, chapter assets and cover
+
+            # Fonts from includes/fonts/, subset to the characters the book uses. This comes
+            # first because every chapter page links the stylesheet that declares them.
+            profiler.stage("fonts")
+            fonts = _epub_fonts(project_path, prefs, chapters)
+            for n, font in enumerate(fonts, start=1):
+                epub.write(font["path"], f"OEBPS/fonts/{font['name']}", compress_type=_compress_type(font["name"]))
+                resource_items.append(_font_item(n, font))
+            stylesheet = None
+            if fonts:
+                epub.writestr(f"OEBPS/{FONTS_CSS}", _fonts_css(fonts))
+                resource_items.append(FONTS_CSS_ITEM)
+                stylesheet = FONTS_CSS
+
+            def included_chapters():
+                for i, chapter in enumerate(chapters, start=1):
+                    if chapter.get("exclude_from_epub"):
+                        continue
+
+                    num = chapter["number"]
+                    chapter_content_path = project_path / "includes" / f"chapter_{num}.html"
+                    if not chapter_content_path.exists():
+                        logging.warning(f"Chapter content for chapter {num} not found at {chapter_content_path}. Skipping.")
+                        continue
+
+                    yield i, chapter, chapter_content_path
+
+            def chapter_parts(i, chapter, body):
+                """Records a chapter and returns its (name, page) entries, split in EPUB 3 mode if oversized."""
+                parts = split_fragment(body, SPLIT_CHAPTER_BYTES) if epub3 else [body]
+                chapter_records.append((i, chapter["title"], len(parts)))
+                return [
+                    (f"OEBPS/{_part_name(i, n)}", get_chapter_html(chapter["title"], part, heading=n == 1, stylesheet=stylesheet))
+                    for n, part in enumerate(parts, start=1)
+                ]
+
+            # Chapters, generated one at a time as the archive asks for them. In streaming mode
+            # each is copied from its fragment in fixed-size chunks rather than read whole;
+            # otherwise, with jobs set, they are compressed across threads.
+            profiler.stage("chapters")
+            if stream:
+                for i, chapter, chapter_content_path in included_chapters():
+                    with profiler.chapter(chapter["number"]):
+                        if epub3 and chapter_content_path.stat().st_size > SPLIT_CHAPTER_BYTES:
+                            # Finding the split points needs the whole chapter, so it is read whole
+                            for name, html in chapter_parts(i, chapter, chapter_content_path.read_text(encoding="utf-8")):
+                                epub.writestr(name, html)
                         else:
-                            logging.error(f"Unsupported cover image type: {cover_image_path}")
-                    else:
-                        logging.warning(f"Cover image not found at {cover_image_path}")
+                            chapter_records.append((i, chapter["title"], 1))
+                            epub.write_stream(f"OEBPS/{_part_name(i, 1)}", partial(stream_chapter_html, chapter["title"], chapter_content_path, stylesheet))
+            else:
+                def chapter_entries():
+                    for i, chapter, chapter_content_path in included_chapters():
+                        with profiler.chapter(chapter["number"]):
+                            entries = chapter_parts(i, chapter, chapter_content_path.read_text(encoding="utf-8"))
+                        yield from entries
+                epub.write_entries(chapter_entries(), jobs)
+
+            # Cover Image
+            profiler.stage("cover")
+            cover = _cover_entry(project_path, prefs, epub3) if epub_prefs.get("cover_image", True) else None
+            if cover:
+                cover_path, cover_name, cover_item = cover
+                epub.write(cover_path, cover_name)
+                resource_items.append(cover_item)
 
+            profiler.stage("chapter assets")
+            # Images and other files referenced from the chapters, stored once each at the same
+            # relative path, so the chapter markup needs no rewriting
+            included = [ch for ch in chapters if not ch.get("exclude_from_epub")]
+            chapter_assets = collect_chapter_assets(project_path, [
+                (str(project_path / "includes" / f"chapter_{ch['number']}.html"), None) for ch in included
+            ])
+            for i, asset in enumerate(_free_assets(chapter_assets, epub.hashes), start=1):
+                resource_items.append(_write_asset(epub, project_path, i, asset))
 
             # content.opf
-            book_id = str(uuid.uuid4())
-            now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-            opf_content = f'''<?xml version="1.0" encoding="UTF-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="BookId" version="2.0">
+            profiler.stage("package")
+            if reproducible:
+                book_id = _stable_book_id(project_path, prefs)
+                now = _source_date(project_path, prefs)
+            else:
+                book_id = str(uuid.uuid4())
+                now = datetime.now(timezone.utc).strftime(DATE_FORMAT)
+            generate_toc = epub_prefs.get("generate_toc", True)
+            epub.write_stream("OEBPS/content.opf", partial(_opf_chunks, prefs, book_id, now, chapter_records, resource_items, epub3, generate_toc))
+
+            # nav.xhtml, which EPUB 3 requires
+            if epub3:
+                epub.write_stream("OEBPS/nav.xhtml", partial(_nav_chunks, prefs, chapter_records))
+
+            # toc.ncx
+            if generate_toc:
+                epub.write_stream("OEBPS/toc.ncx", partial(_ncx_chunks, prefs, book_id, chapter_records))
+
+        save_build_manifest(project_path, manifest)
+        if epub.rewritten:
+            logging.info(f"EPUB created at {output_path} ({epub.reused} entries reused, {epub.compressed} compressed)")
+        else:
+            logging.info(f"EPUB at {output_path} is unchanged")
+        if profiler.finish():
+            logging.info(profile_summary(profiler.report))
+        return str(output_path)
+    except Exception as e:
+        profiler.discard()
+        logging.error(f"Error generating EPUB: {e}")
+        return None
+
+def _stored_pref(project_path, prefs, key, default):
+    """prefs[key] from prefs.json, set to default() and saved there on first use."""
+    if not prefs.get(key):
+        # Saved into freshly loaded prefs, so nothing else the caller changed is persisted
+        stored = load_prefs(project_path)
+        stored[key] = stored.get(key) or default()
+        save_prefs(project_path, stored)
+        prefs[key] = stored[key]
+    return prefs[key]
+
+def _stable_book_id(project_path, prefs):
+    """The book's identifier from prefs.json, created and saved there on first use."""
+    return _stored_pref(project_path, prefs, "book_id", lambda: str(uuid.uuid4()))
+
+def _source_date(project_path, prefs):
+    """
+    The date of a reproducible build: SOURCE_DATE_EPOCH when set (the reproducible-builds
+    convention), otherwise book_date from prefs.json, the date of the first reproducible
+    build, saved there on first use. File modification times are not used, since a fresh
+    checkout of the same sources has different ones.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), timezone.utc).strftime(DATE_FORMAT)
+    return _stored_pref(project_path, prefs, "book_date", lambda: datetime.now(timezone.utc).strftime(DATE_FORMAT))
+
+def _compress_type(name):
+    """Media that is already compressed is stored as it is."""
+    return zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in COMPRESSED_MEDIA_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def _epub_fonts(project_path, prefs, chapters):
+    """The fonts to embed (see core.src.fonts), or none when embed_fonts is off in the EPUB layout settings."""
+    if not prefs.get("epub_display_features", {}).get("embed_fonts", True):
+        return []
+    # Book and per-chapter titles, and the nav heading, are shown too
+    extra_text = [prefs.get("story_title", "Untitled"), prefs.get("story_author", "Anonymous"), ": Contents"]
+    return embedded_fonts(str(project_path), chapters, "exclude_from_epub", extra_text)
+
+def _font_item(n, font):
+    return f'<item id="font{n}" href="fonts/{escape(font["name"])}" media-type="{font["media_type"]}"/>'
+
+def _fonts_css(fonts):
+    return font_face_css(fonts, lambda font: f"fonts/{font['name']}")
+
+def _free_assets(assets, taken):
+    """
+    The chapter assets that can be stored at their own path. One whose entry name is already
+    taken (by the cover, a font, a chapter page or a package file) is left out with a warning,
+    rather than replacing that entry.
+    """
+    taken = set(taken) | PACKAGE_ENTRIES
+    free = []
+    for asset in assets:
+        if f"OEBPS/{posixpath.normpath(asset)}" in taken:
+            logging.warning(f"Chapter asset {asset} has the same name as a generated EPUB file; it is not included.")
+        else:
+            free.append(asset)
+    return free
+
+def _write_asset(epub, project_path, i, asset):
+    """Writes a chapter asset at its includes/-relative path. Returns its manifest item."""
+    mimetype, _ = mimetypes.guess_type(asset)
+    epub.write(str(project_path / "includes" / asset), f"OEBPS/{asset}", compress_type=_compress_type(asset))
+    return f'<item id="asset{i}" href="{escape(asset)}" media-type="{mimetype or "application/octet-stream"}"/>'
+
+def _cover_entry(project_path, prefs, epub3=False):
+    """Returns (file, archive name, manifest item) for the cover image, or None if there is none."""
+    cover_image_path_str = prefs.get("cover_image")
+    if not cover_image_path_str:
+        return None
+    cover_image_path = project_path / "includes" / cover_image_path_str
+    if not cover_image_path.exists():
+        logging.warning(f"Cover image not found at {cover_image_path}")
+        return None
+    properties = ' properties="cover-image"' if epub3 else "" # How EPUB 3 marks the cover
+    variants = cover_variants(project_path, str(cover_image_path))
+    if variants:
+        # E-reader sized JPEG instead of the full-size upload
+        return os.path.join(variants["dir"], variants["epub"]), "OEBPS/images/cover.jpeg", f'<item id="cover-image" href="images/cover.jpeg" media-type="image/jpeg"{properties}/>'
+    mimetype, _ = mimetypes.guess_type(str(cover_image_path))
+    if not mimetype:
+        logging.error(f"Unsupported cover image type: {cover_image_path}")
+        return None
+    image_filename = "cover." + mimetype.split("/")[1]
+    # spine_items.insert(0, '<itemref idref="cover-image"/>') # This can cause issues with some readers
+    return str(cover_image_path), f"OEBPS/images/{image_filename}", f'<item id="cover-image" href="images/{image_filename}" media-type="{mimetype}"{properties}/>'
+
+def build_chapter_epubs(project_path, prefs, chapters, jobs=None, force=False):
+    """
+    Builds a single-chapter EPUB for each chapter in download/, the files chapter pages link
+    to when epub_link is on. The entries every package shares (mimetype, container.xml, the
+    cover and the embedded fonts, subset to the whole book's text) are compressed once and
+    copied into each package as raw bytes; the packages are stamped out across `jobs`
+    processes, and only chapters that changed are rebuilt.
+    Each package is reproducible: its identifier is derived from the book's (see
+    _chapter_book_id), it carries the book's date, and its zip entries have a fixed date.
+    Returns the summary from build_chapter_downloads.
+    """
+    project_path = Path(project_path)
+    epub_prefs = prefs.get("epub_layout", {})
+    # Read (or created) once here, not in the workers, which would race to save prefs.json
+    book_id = _stable_book_id(project_path, prefs)
+    date = _source_date(project_path, prefs)
+    shared_entries = [
+        prepare_entry("mimetype", "application/epub+zip", zipfile.ZIP_STORED, REPRODUCIBLE_DATE_TIME),
+        prepare_entry("META-INF/container.xml", CONTAINER_XML, date_time=REPRODUCIBLE_DATE_TIME),
+    ]
+    shared_items = [] # Manifest items for the shared entries
+    fonts = _epub_fonts(project_path, prefs, chapters)
+    for n, font in enumerate(fonts, start=1):
+        with open(font["path"], "rb") as f:
+            shared_entries.append(prepare_entry(f"OEBPS/fonts/{font['name']}", f.read(), _compress_type(font["name"]), REPRODUCIBLE_DATE_TIME))
+        shared_items.append(_font_item(n, font))
+    stylesheet = None
+    if fonts:
+        shared_entries.append(prepare_entry(f"OEBPS/{FONTS_CSS}", _fonts_css(fonts), date_time=REPRODUCIBLE_DATE_TIME))
+        shared_items.append(FONTS_CSS_ITEM)
+        stylesheet = FONTS_CSS
+    cover = _cover_entry(project_path, prefs) if epub_prefs.get("cover_image", True) else None
+    if cover:
+        cover_path, cover_name, cover_item = cover
+        with open(cover_path, "rb") as f:
+            shared_entries.append(prepare_entry(cover_name, f.read(), _compress_type(cover_name), REPRODUCIBLE_DATE_TIME))
+        shared_items.append(cover_item)
+
+    shared_signature = hash_value({
+        "version": CHAPTER_EPUB_VERSION,
+        "entries": [(zinfo.filename, zinfo.compress_type, zinfo.CRC, zinfo.file_size) for zinfo, _ in shared_entries],
+        "book": {key: prefs.get(key) for key in ("story_title", "story_author")},
+        "book_id": book_id,
+        "date": date,
+        "generate_toc": epub_prefs.get("generate_toc", True),
+    })
+    return build_chapter_downloads(
+        str(project_path), prefs, chapters, "epub", "exclude_from_epub", shared_signature,
+        _stamp_chapter_epub, (str(project_path), prefs, book_id, date, shared_entries, shared_items, stylesheet), jobs, force
+    )
+
+def _chapter_book_id(book_id, num):
+    """The identifier of chapter num's EPUB: the same on every build, and different for each chapter."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"urn:uuid:{book_id}#chapter{num}"))
+
+def _stamp_chapter_epub(item, project_path, prefs, book_id, date, shared_entries, shared_items, stylesheet):
+    """Writes one chapter's EPUB: the prepared shared entries, then the chapter, its assets and package files."""
+    chapter, output_path, assets = item
+    project_path = Path(project_path)
+    num, title = chapter["number"], chapter["title"]
+    book_prefs = dict(prefs, story_title=f'{prefs.get("story_title", "Untitled")}: {title}')
+    body = (project_path / "includes" / f"chapter_{num}.html").read_text(encoding="utf-8")
+
+    with replace_file(output_path, keep_identical=True) as f:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            for zinfo, raw in shared_entries:
+                write_raw_entry(zf, zinfo, raw)
+            # Nothing to reuse; the archive only gives the remaining entries the fixed date
+            epub = EpubArchive(zf, None, {}, REPRODUCIBLE_DATE_TIME)
+            epub.writestr(f"OEBPS/chapter{num}.html", get_chapter_html(title, body, stylesheet=stylesheet))
+            assets = _free_assets(assets, [zinfo.filename for zinfo, _ in shared_entries] + list(epub.hashes))
+            resource_items = [_write_asset(epub, project_path, i, asset) for i, asset in enumerate(assets, start=1)] + shared_items
+
+            chapter_records = [(num, title, 1)]
+            chapter_book_id = _chapter_book_id(book_id, num)
+            generate_toc = prefs.get("epub_layout", {}).get("generate_toc", True)
+            epub.writestr("OEBPS/content.opf", "".join(_opf_chunks(book_prefs, chapter_book_id, date, chapter_records, resource_items, ncx=generate_toc)))
+            if generate_toc:
+                epub.writestr("OEBPS/toc.ncx", "".join(_ncx_chunks(book_prefs, chapter_book_id, chapter_records)))
+
+def _part_name(i, n):
+    """The file name of part n of chapter i; the first part keeps the chapter's own name."""
+    return f"chapter{i}.html" if n == 1 else f"chapter{i}_{n}.html"
+
+def _part_id(i, n):
+    return f"chap{i}" if n == 1 else f"chap{i}_{n}"
+
+def _opf_chunks(prefs, book_id, date, chapter_records, resource_items, epub3=False, ncx=True):
+    """Yields content.opf a piece at a time."""
+    # EPUB 3 also requires the modification date as dcterms:modified
+    version, modified = ("3.0", f'\n    <meta property="dcterms:modified">{date}</meta>') if epub3 else ("2.0", "")
+    yield f'''<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" unique-identifier="BookId" version="{version}">
   <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
     <dc:title>{prefs.get("story_title", "Untitled")}</dc:title>
     <dc:creator>{prefs.get("story_author", "Anonymous")}</dc:creator>
     <dc:language>en</dc:language>
     <dc:identifier id="BookId">{book_id}</dc:identifier>
-    <dc:date>{now}</dc:date>
+    <dc:date>{date}</dc:date>{modified}
   </metadata>
   <manifest>
-    {"".join(manifest_items)}
+    '''
+    if epub3:
+        yield '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+    for i, _, parts in chapter_records:
+        for n in range(1, parts + 1):
+            yield f'<item id="{_part_id(i, n)}" href="{_part_name(i, n)}" media-type="application/xhtml+xml"/>'
+    yield from resource_items
+    if ncx:
+        yield '''
     <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
   </manifest>
   <spine toc="ncx">
-    {"".join(spine_items)}
+    '''
+    else:
+        yield '''
+  </manifest>
+  <spine>
+    '''
+    for i, _, parts in chapter_records:
+        for n in range(1, parts + 1):
+            yield f'<itemref idref="{_part_id(i, n)}"/>'
+    yield '''
   </spine>
 </package>'''
-            epub.writestr("OEBPS/content.opf", opf_content)
 
-            # toc.ncx
-            if epub_prefs.get("generate_toc", True):
-                ncx_content = f'''<?xml version="1.0" encoding="UTF-8"?>
+def _nav_chunks(prefs, chapter_records):
+    """Yields nav.xhtml, the EPUB 3 table of contents, a piece at a time. Entries link to each chapter's first part."""
+    yield f'''<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+  <head><title>{escape(prefs.get("story_title", "Untitled"))}</title></head>
+  <body>
+    <nav epub:type="toc" id="toc">
+      <h1>Contents</h1>
+      <ol>'''
+    for i, title, _ in chapter_records:
+        yield f'''
+        <li><a href="{_part_name(i, 1)}">{escape(title)}</a></li>'''
+    yield '''
+      </ol>
+    </nav>
+  </body>
+</html>'''
+
+def _ncx_chunks(prefs, book_id, chapter_records):
+    """Yields toc.ncx a piece at a time."""
+    yield f'''<?xml version="1.0" encoding="UTF-8"?>
 <ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
   <head>
     <meta name="dtb:uid" content="{book_id}"/>
@@ -115,23 +430,41 @@ def build_epub(project_path, prefs, chapters):
   </head>
   <docTitle><text>{prefs.get("story_title", "Untitled")}</text></docTitle>
   <navMap>
-    {"".join(toc_navpoints)}
+    '''
+    for i, title, _ in chapter_records:
+        yield f'''
+              <navPoint id="navPoint-{i}" playOrder="{i}">
+                <navLabel><text>{title}</text></navLabel>
+                <content src="{_part_name(i, 1)}"/>
+              </navPoint>'''
+    yield '''
   </navMap>
 </ncx>'''
-                epub.writestr("OEBPS/toc.ncx", ncx_content)
 
-        logging.info(f"EPUB created at {output_path}")
-        return str(output_path)
-    except Exception as e:
-        logging.error(f"Error generating EPUB: {e}")
-        return None
-
-def get_chapter_html(title, body):
+def _chapter_html_parts(title, heading=True, stylesheet=None):
+    """
+    The markup before and after a chapter's body text. Continuation parts of a split chapter
+    have no heading; stylesheet is linked from the head when given.
+    """
+    heading = f"\n    <h1>{title}</h1>" if heading else ""
+    link = f'<link rel="stylesheet" type="text/css" href="{stylesheet}"/>' if stylesheet else ""
     return f'''<?xml version="1.0" encoding="UTF-8"?>
 <html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>{title}</title></head>
-  <body>
-    <h1>{title}</h1>
-    <div>{body}</div>
+  <head><title>{title}</title>{link}</head>
+  <body>{heading}
+    <div>''', '''</div>
   </body>
 </html>'''
+
+def get_chapter_html(title, body, heading=True, stylesheet=None):
+    prefix, suffix = _chapter_html_parts(title, heading, stylesheet)
+    return prefix + body + suffix
+
+def stream_chapter_html(title, fragment_path, stylesheet=None):
+    """Yields the same page as get_chapter_html, reading the fragment STREAM_CHUNK_SIZE characters at a time."""
+    prefix, suffix = _chapter_html_parts(title, stylesheet=stylesheet)
+    yield prefix
+    with open(fragment_path, "r", encoding="utf-8") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), ""):
+            yield chunk
+    yield suffix
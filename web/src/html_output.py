@@ -1,10 +1,32 @@
 import os
-import shutil
 import json
+import shutil
 import markdown # For converting markdown blurb to HTML
 from core.src.utils import load_prefs, load_json
 from web.src.chapter_utils import format_chapter_heading, get_includes_path # Adjusted for web context, added get_includes_path
-from core.src.social_utils import load_links
+from web.src.render_context import RenderContext
+from web.src.site_templates import BODY_MARKER, get_site_environment, render_site_template, templates_signature
+from core.src.profiling import BuildProfile, profile_summary
+from core.src.fileio import copy_stream, replace_file
+from core.src.asset_sync import find_assets, sync_assets, sync_file
+from core.src.minify import minify_html, minify_css
+from core.src.images import cover_variants
+from core.src.chapter_assets import collect_chapter_assets
+from core.src.releases import (
+    symlinks_supported, stage_release, publish_release, discard_release, rollback_release, release_unchanged,
+    current_release, save_release_state, load_release_state
+)
+from core.src.precompress import precompress_tree, remove_compressed_siblings
+from web.src.publish_options import get_publish_options
+from web.src.chapter_downloads import chapter_download_name
+from core.src.chapter_nav import get_neighbours, published_chapters
+from core.src.toc import split_toc, latest_chapters
+from core.src.search_index import MIN_TERM_LENGTH, update_search_index
+from core.src.feeds import update_entry_dates, atom_feed, shard_urls, sitemap, sitemap_index
+from core.src.build_manifest import (
+    RENDER_VERSION, HTML_PREF_KEYS, load_build_manifest, save_build_manifest,
+    hash_source, hash_value, page_is_current, record_page
+)
 
 # Define default.css file for projects (moved from cli/src/html_output.py)
 DEFAULT_CSS = """\
@@ -98,164 +120,162 @@ a:hover {
 }
 """
 
-def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapter_list=None, relative_path_to_root=""):
-    features = prefs.get("display_features", {})
-    cover_path = prefs.get("cover_image", "")
-    story_title = prefs.get("story_title", "")
-    author = prefs.get("story_author", "")
-    use_titles = features.get("use_chapter_titles", True)
-
-    html = ['<header class="chapter-header">']
-
-    # Cover Image (if enabled)
-    if features.get("cover_image", True) and cover_path:
-        html.append(f'<img src="{relative_path_to_root}{os.path.basename(cover_path)}" alt="Cover" class="cover" />')
-
-    # Title + Author
-    html.append(f'<h1>{story_title}</h1>')
-    html.append(f'<h3>{author}</h3>')
-
-    # Chapter Heading (if present and enabled)
-    if chapter and use_titles:
-        number = chapter["number"]
-        heading = chapter["title"]
-        chapter_heading = f"Chapter {number}: {heading}" if heading else f"Chapter {number}"
-        html.append(f'<h2>{chapter_heading}</h2>')
-
-    # Top chapter Navigation
-    if chapter and features.get("chapter_nav_top", True) and chapter_list:
-        html.append(html_chapter_nav(chapter, chapter_list, prefs, relative_path_to_root))
-
-    # EPUB/PDF download links
-    download_links = []
-    if chapter and features.get("epub_link") and epub_exists:
-        slug = story_title.lower().replace(" ", "_")
-        download_links.append(f'<a href="{relative_path_to_root}download/{slug}_chapter_{chapter["number"]}.epub">EPUB</a>')
-    if chapter and features.get("pdf_link") and pdf_exists:
-        slug = story_title.lower().replace(" ", "_")
-        download_links.append(f'<a href="{relative_path_to_root}download/{slug}_chapter_{chapter["number"]}.pdf">PDF</a>')
-
-    if download_links:
-        html.append('<div class="download-links">' + " | ".join(download_links) + '</div>')
-
-    html.append('</header>')
-    return "\n".join(html)
-
-def html_chapter_nav(current_chapter, chapter_list, prefs, relative_path_to_root=""):
-    features = prefs.get("display_features", {})
-    use_titles = features.get("use_chapter_titles", True)
-
-    index = next((i for i, ch in enumerate(chapter_list) if ch["number"] == current_chapter["number"]), None)
-    nav_links = []
-
-    # Previous
-    if index is not None and index > 0:
-        prev = chapter_list[index - 1]
-        prev_title = f"Chapter {prev['number']}: {prev['title']}" if use_titles else f"Chapter {prev['number']}"
-        nav_links.append(f'<a href="{prev["number"]}.html">&larr; Previous ({prev_title})</a>')
-    else:
-        nav_links.append('<span class="disabled">&larr; Previous</span>')
-
-    # TOC
-    nav_links.append(f'<a href="{relative_path_to_root}index.html">Table of Contents</a>')
-
-    # Next
-    if index is not None and index < len(chapter_list) - 1:
-        nxt = chapter_list[index + 1]
-        next_title = f"Chapter {nxt['number']}: {nxt['title']}" if use_titles else f"Chapter {nxt['number']}"
-        nav_links.append(f'<a href="{nxt["number"]}.html">Next ({next_title}) &rarr;</a>')
-    else:
-        nav_links.append('<span class="disabled">Next &rarr;</span>')
-
-    return f'<nav class="chapter-nav">\n  {" | ".join(nav_links)}\n</nav>'
-
-def html_footer(prefs, chapter=None, chapter_list=None, project_path=None, relative_path_to_root=""):
-    try:
-        share_links, follow_links, handles = load_links(project_path)
-    except (FileNotFoundError, json.JSONDecodeError):
-        share_links = []
-        follow_links = {}
-        handles = {}
-
-    features = prefs.get("display_features", {})
-    html = ['<footer class="footer">']
-
-    # Bottom Chapter Navigation
-    if chapter and features.get("chapter_nav_bottom", True) and chapter_list:
-        html.append(html_chapter_nav(chapter, chapter_list, prefs, relative_path_to_root))
-
-    # Share This Chapter Links
-    if chapter and features.get("share_links", True) and share_links:
-        html.append('<div class="share-links"><p>Share this chapter:</p>')
-        for platform in share_links:
-            if platform == "email":
-                html.append(f'<a href="mailto:?subject=Check out this chapter">Email</a>')
-            elif platform == "x":
-                html.append(f'<a href="https://twitter.com/intent/tweet?text=Reading+{prefs["story_title"]}">X</a>')
-            elif platform == "mastodon":
-                html.append('<a href="#" onclick="alert(\'Toot manually using your Mastodon instance.\')">Mastodon</a>')
-            elif platform == "bluesky":
-                html.append('<a href="https://bsky.app/">Bluesky</a>')
-        html.append('</div>')
-
-    # Discuss This Chapter Link
-    if chapter and features.get("discuss_link", True) and chapter.get("discussion"):
-        html.append(f'<div class="discussion-link"><a href="{chapter["discussion"]}" target="_blank">Discuss this Chapter</a></div>')
-
-    # Social Follow Links
-    if features.get("social_links", True) and follow_links:
-        html.append('<div class="follow-links"><p>Follow me:</p>')
-        for platform, handle in follow_links.items():
-            handle_value = handles.get(platform) # Get handle from handles dict
-            if handle_value:
-                if platform == "github":
-                    url = f"https://github.com/{handle_value}"
-                elif platform == "x":
-                    url = f"https://x.com/{handle_value}"
-                elif platform == "bluesky":
-                    url = f"https://bsky.app/profile/{handle_value}.bsky.social"
-                elif platform == "mastodon":
-                    url = handle_value  # Full URL expected
-                else:
-                    url = f"https://www.instagram.com/{handle_value}" # Default to Instagram if no specific URL
-                html.append(f'<a href="{url}" target="_blank">{platform.title()}</a>')
-        html.append('</div>')
-
-    # Copyright
-    if features.get("copyright", True):
-        html.append(f'<p>&copy; {prefs.get("copyright", "")} {prefs.get("story_author", "")}</p>')
-
-    # License Info
-    if features.get("license", True):
-        raw_license_data = prefs.get("license", "")
-        license_code_id = ""
-        license_url_from_pref = None
-
-        if isinstance(raw_license_data, dict):
-            license_code_id = raw_license_data.get("id", "")
-            license_url_from_pref = raw_license_data.get("url")
-        elif isinstance(raw_license_data, str):
-            license_code_id = raw_license_data
-
-        license_map = {
-            "CC-BY-NC-SA-4.0": "https://creativecommons.org/licenses/by-nc-sa/4.0/"
-            # Add more codes here as needed
-        }
-        license_url = license_url_from_pref if license_url_from_pref else license_map.get(license_code_id, "#")
-        html.append(f'<p>Licensed under <a href="{license_url}" target="_blank">{license_code_id}</a></p>')
-
-    html.append('Powered by <a href="https://www.github.com/ironmangary/publine" target="_blank">Publine</a><br>')
-    html.append('</footer>')
-    return "\n".join(html)
-
-def build_html(project_path, prefs, chapters):
-    """Build HTML files for the project."""
+# Results shown on the search page
+MAX_SEARCH_RESULTS = 50
+
+# Build manifest records that describe the files in public/ rather than the sources. Each
+# release keeps its own copy (see save_release_state) for rollback_html.
+RELEASE_STATE_KEYS = (
+    "pages", "search", "feeds", "precompressed", "precompress_sources",
+    "assets", "chapter_assets", "minified_assets", "cover_files", "download_files"
+)
+
+def _template_vars(prefs, context, chapter=None, chapter_list=None, relative_path_to_root="", epub_exists=False, pdf_exists=False):
+    """Variables available to the site templates when rendering a header, footer or page."""
+    features = context.features
+    prev_ch, next_ch = get_neighbours(context.neighbours, chapter) if chapter else (None, None)
+    download_base = f"{relative_path_to_root}download/{context.slug}_chapter_{chapter['number']}" if chapter else ""
+    return {
+        "prefs": prefs,
+        "features": features,
+        "story_title": prefs.get("story_title", ""),
+        "author": prefs.get("story_author", ""),
+        "use_titles": features.get("use_chapter_titles", True),
+        "cover_name": f"images/{context.cover['fallback']['jpeg']}" if context.cover else os.path.basename(prefs.get("cover_image", "")),
+        "cover": context.cover,
+        "chapter": chapter,
+        "chapter_list": chapter_list,
+        "prev": prev_ch,
+        "next": next_ch,
+        "root": relative_path_to_root,
+        "epub_href": f"{download_base}.epub" if chapter and features.get("epub_link") and epub_exists else None,
+        "pdf_href": f"{download_base}.pdf" if chapter and features.get("pdf_link") and pdf_exists else None,
+        "share_block": context.share_block,
+        "follow_block": context.follow_block,
+        "copyright_line": context.copyright_line,
+        "license_block": context.license_block,
+    }
+
+def _encode_page(html, context):
+    """The bytes written for a rendered page, minified when the minify option is on."""
+    return (minify_html(html) if context.minify else html).encode("utf-8")
+
+def html_header(prefs, chapter=None, epub_exists=False, pdf_exists=False, chapter_list=None, relative_path_to_root="", context=None):
+    if context is None:
+        context = RenderContext(prefs, None, chapter_list)
+    variables = _template_vars(prefs, context, chapter, chapter_list, relative_path_to_root, epub_exists, pdf_exists)
+    return render_site_template(context.project_path, "header.html", **variables).rstrip("\n")
+
+def html_chapter_nav(current_chapter, chapter_list, prefs, relative_path_to_root="", neighbours=None, context=None):
+    if context is None:
+        context = RenderContext(prefs, None, chapter_list if neighbours is None else None)
+        if neighbours is not None:
+            context.neighbours = neighbours
+    variables = _template_vars(prefs, context, current_chapter, chapter_list, relative_path_to_root)
+    return render_site_template(context.project_path, "chapter_nav.html", **variables).rstrip("\n")
+
+def html_footer(prefs, chapter=None, chapter_list=None, project_path=None, relative_path_to_root="", context=None):
+    if context is None:
+        context = RenderContext(prefs, project_path, chapter_list)
+    variables = _template_vars(prefs, context, chapter, chapter_list, relative_path_to_root)
+    return render_site_template(context.project_path, "footer.html", **variables).rstrip("\n")
+
+def build_html(project_path, prefs, chapters, force=False, jobs=None, profile=False):
+    """
+    Build HTML files for the project.
+    Pages whose inputs are unchanged since the last build (per data/build_manifest.json)
+    are skipped unless force is True. Chapter pages are rendered across `jobs` worker
+    processes (0 = one per CPU). Returns a summary of written, skipped and failed pages.
+
+    With the atomic_publish option the site is built into a staging release that hard-links
+    every unchanged file from the live one, and public/ is switched to it in one step once
+    the build succeeds, so readers never see a half-written site. A build that changes
+    nothing publishes no new release.
+
+    With profile=True each build stage and chapter page is timed and measured, and the report
+    is saved to data/build_profile.json.
+    """
     print("\n🛠️ Generating HTML...")
-    public_dir = os.path.join(project_path, "public")
-    os.makedirs(public_dir, exist_ok=True)
+    profiler = BuildProfile(project_path, "html", enabled=profile)
+    profiler.stage("setup")
     download_dir = os.path.join(project_path, "download")
     os.makedirs(download_dir, exist_ok=True) # Ensure download dir exists for epub/pdf links
 
+    options = get_publish_options(prefs)
+    manifest = load_build_manifest(project_path)
+    staging = None
+    if options["atomic_publish"]:
+        if symlinks_supported(project_path):
+            staging = stage_release(project_path)
+        else:
+            print("⚠️ Symlinks are not available here; publishing directly into public/.")
+
+    public_dir = staging or os.path.join(project_path, "public")
+    os.makedirs(public_dir, exist_ok=True)
+    try:
+        summary = _build_site(project_path, prefs, chapters, public_dir, manifest, options, force, jobs, profiler)
+        if staging:
+            profiler.stage("publish release")
+            if release_unchanged(project_path, staging):
+                discard_release(staging)
+                print("⏭️ Nothing changed; the live release stays published.")
+            else:
+                release = publish_release(project_path, staging, options["keep_releases"])
+                summary["release"] = release
+                print(f"🚀 Published release {release}")
+            save_release_state(project_path, current_release(project_path), {
+                key: manifest[key] for key in RELEASE_STATE_KEYS if key in manifest
+            })
+    except BaseException:
+        profiler.discard()
+        if staging:
+            discard_release(staging)
+        raise
+
+    profiler.stage("save manifest")
+    save_build_manifest(project_path, manifest)
+    if profiler.finish():
+        print(f"⏱️ {profile_summary(profiler.report)}")
+    if summary["skipped"]:
+        print(f"⏭️ Skipped {len(summary['skipped'])} unchanged file(s).")
+    if summary["failed"]:
+        print(f"⚠️ {len(summary['failed'])} chapter page(s) failed to render.")
+    print(f"✅ HTML generation complete ({len(summary['written'])} written, {len(summary['skipped'])} unchanged).")
+    return summary
+
+def rollback_html(project_path):
+    """
+    Switches public/ back to the previously published release.
+    The build manifest's records of the published files (RELEASE_STATE_KEYS) describe the
+    newer release, so they are replaced with the ones saved when the older release was
+    built. For a release built before those were saved they are cleared instead, and the
+    next build regenerates every page, the whole search index and every compressed sibling.
+    """
+    release = rollback_release(project_path)
+    if release:
+        manifest = load_build_manifest(project_path)
+        state = load_release_state(project_path, release)
+        for key in RELEASE_STATE_KEYS:
+            manifest.pop(key, None)
+        if state is not None:
+            manifest.update(state)
+        else:
+            # Left set rather than removed, so a build with search or precompression off still
+            # clears what the older release has
+            manifest["search"] = {}
+            manifest["precompressed"] = True
+        manifest.setdefault("pages", {})
+        save_build_manifest(project_path, manifest)
+        print(f"⏪ Rolled back to release {release}")
+    return release
+
+def _build_site(project_path, prefs, chapters, public_dir, manifest, options, force, jobs, profiler):
+    """Writes the site into public_dir, recording what was built in manifest."""
+    # Drafts are not published; pages left from before a chapter became a draft are removed below
+    chapters = published_chapters(chapters)
+    summary = {"written": [], "skipped": [], "failed": []}
+    profiler.stage("assets")
+
     # Check for styles.css
     style_src = os.path.join(project_path, "includes", "styles.css")
     if not os.path.isfile(style_src):
@@ -265,82 +285,416 @@ def build_html(project_path, prefs, chapters):
                 f.write(DEFAULT_CSS)
         print("✅ Default stylesheet created.")
 
-    # Copy styles.css
-    style_dst = os.path.join(public_dir, "styles.css")
-    if os.path.isfile(style_src): # Always copy, potentially overwrite if already exists
-        shutil.copyfile(style_src, style_dst)
-        print(f"✅ Copied stylesheet to {style_dst}")
-
-    # Copy cover image
+    # Resized cover variants replace the full-size upload on the site when Pillow can make them
     cover_filename = prefs.get("cover_image", "")
-    if cover_filename:
-        cover_src = os.path.join(project_path, "includes", cover_filename)
-        cover_dst = os.path.join(public_dir, os.path.basename(cover_src))
-        if os.path.isfile(cover_src):
-            shutil.copyfile(cover_src, cover_dst)
-            print(f"✅ Copied cover image to {cover_dst}")
+    cover_src = os.path.join(project_path, "includes", cover_filename) if cover_filename else None
+    variants = None
+    if cover_src and os.path.isfile(cover_src):
+        variants = cover_variants(project_path, cover_src, hash_source(manifest, cover_src))
+    elif cover_src:
+        print(f"⚠️ Cover image file not found: {cover_src}")
+
+    # Images and other files the chapter text refers to. They are published under chapter/
+    # (below) rather than at the site root, since that is where the chapter pages resolve them.
+    chapter_assets = collect_chapter_assets(project_path, [
+        (fragment, hash_source(manifest, fragment))
+        for fragment in (os.path.join(project_path, "includes", f"chapter_{ch['number']}.html") for ch in chapters)
+    ])
+    # The stylesheet and cover are needed at the root by the site's own pages
+    root_only = {"styles.css", os.path.normpath(cover_filename)} if cover_filename else {"styles.css"}
+    chapter_only = [asset for asset in chapter_assets if os.path.normpath(asset) not in root_only]
+
+    # Publish styles.css, the cover image and every other static asset under includes/,
+    # linking or copying only the files that changed since the last build
+    # Stylesheets are written minified instead when the minify option is on
+    includes_path = get_includes_path(project_path)
+    minified_assets = [
+        asset for asset in find_assets(includes_path) if asset.lower().endswith(".css") and asset not in chapter_only
+    ] if options["minify"] else []
+    previous_assets = manifest.get("assets", [])
+    assets, results = sync_assets(
+        includes_path, public_dir, previous_assets,
+        exclude=([cover_filename] if variants else []) + minified_assets + chapter_only
+    )
+    for asset, result in results.items():
+        manifest["pages"].pop(asset, None) # Recorded as pages by earlier versions
+        if result == "unchanged":
+            summary["skipped"].append(asset)
+        elif result == "removed":
+            print(f"🗑️ Removed stale asset {asset}")
         else:
-            print(f"⚠️ Cover image file not found: {cover_src}")
-
+            summary["written"].append(asset)
+            print(f"✅ Published {asset} ({result})")
+    manifest["assets"] = assets
+
+    for asset in minified_assets:
+        asset_src = os.path.join(includes_path, asset)
+        asset_signature = hash_value({"source": hash_source(manifest, asset_src), "minify": True})
+        asset_dst = os.path.join(public_dir, asset)
+        if not force and page_is_current(manifest, asset, asset_signature, asset_dst):
+            summary["skipped"].append(asset)
+            continue
+        with open(asset_src, "r", encoding="utf-8") as f:
+            css = minify_css(f.read())
+        os.makedirs(os.path.dirname(asset_dst), exist_ok=True)
+        with replace_file(asset_dst) as f:
+            f.write(css.encode("utf-8"))
+        record_page(manifest, asset, asset_signature)
+        summary["written"].append(asset)
+        print(f"✅ Published {asset} (minified)")
+    for asset in set(manifest.get("minified_assets", [])) - set(minified_assets):
+        manifest["pages"].pop(asset, None)
+        if asset not in assets and os.path.exists(os.path.join(public_dir, asset)):
+            os.remove(os.path.join(public_dir, asset))
+            print(f"🗑️ Removed stale asset {asset}")
+    manifest["minified_assets"] = minified_assets
+
+    cover_files = []
+    if variants:
+        for variant in variants["web"]:
+            cover_files += [f"images/{variant['webp']}", f"images/{variant['jpeg']}"]
+        for path in cover_files:
+            result = sync_file(os.path.join(variants["dir"], os.path.basename(path)), os.path.join(public_dir, path))
+            (summary["skipped"] if result == "unchanged" else summary["written"]).append(path)
+    elif cover_src and os.path.isfile(cover_src) and os.path.dirname(os.path.normpath(cover_filename)):
+        # Pages refer to the cover by file name at the site root
+        sync_file(cover_src, os.path.join(public_dir, os.path.basename(cover_src)))
+    for path in set(manifest.get("cover_files", [])) - set(cover_files):
+        if os.path.exists(os.path.join(public_dir, path)):
+            os.remove(os.path.join(public_dir, path))
+    manifest["cover_files"] = cover_files
+
+    # Compile the site templates (including any theme overrides) once for this build, then
+    profiler.stage("templates")
+    # the header/footer pieces shared by every page
+    get_site_environment(project_path, reload=True)
+    context = RenderContext(prefs, project_path, chapters, output_dir=public_dir)
+    context.cover = variants
+    context.minify = options["minify"]
+    os.makedirs(os.path.join(public_dir, "chapter"), exist_ok=True)
+
+    profiler.stage("chapter assets")
+    # Chapter assets, published beside the chapter pages so the fragments' relative references
+    # resolve unchanged. Each is copied once, however many chapters use it.
+    for asset in chapter_assets:
+        page = f"chapter/{asset}"
+        result = sync_file(os.path.join(project_path, "includes", asset), os.path.join(public_dir, page))
+        (summary["skipped"] if result == "unchanged" else summary["written"]).append(page)
+    for asset in set(manifest.get("chapter_assets", [])) - set(chapter_assets):
+        stale_path = os.path.join(public_dir, "chapter", asset)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            print(f"🗑️ Removed stale chapter asset {stale_path}")
+    manifest["chapter_assets"] = chapter_assets
+
+    # Per-chapter EPUB and PDF downloads (see chapter_downloads.py), published at the
+    # download/ path the chapter pages link to; only those of published chapters
+    download_files = sorted(
+        chapter_download_name(prefs, ch, extension)
+        for ch in chapters for extension in ("epub", "pdf") if context.has_download(ch, extension)
+    )
+    for name in download_files:
+        page = f"download/{name}"
+        result = sync_file(os.path.join(project_path, "download", name), os.path.join(public_dir, page))
+        (summary["skipped"] if result == "unchanged" else summary["written"]).append(page)
+    for name in set(manifest.get("download_files", [])) - set(download_files):
+        stale_path = os.path.join(public_dir, "download", name)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            print(f"🗑️ Removed stale download {stale_path}")
+    manifest["download_files"] = download_files
+
+    # Inputs shared by every page: layout prefs, links.json and the site templates
+    shared_inputs = {
+        "render_version": RENDER_VERSION,
+        "templates": templates_signature(project_path, manifest),
+        "prefs": {key: prefs.get(key) for key in HTML_PREF_KEYS},
+        "cover": variants["web"] if variants else None,
+        "minify": options["minify"],
+        "links": hash_source(manifest, os.path.join(project_path, "data", "links.json")),
+    }
+    shared_signature = hash_value(shared_inputs)
+
+    profiler.stage("chapter pages")
+    current_pages = set()
+    pending = []
     for ch in chapters:
-        create_html_chapter_page(ch, chapters, prefs, project_path)
-    create_html_index_page(chapters, prefs, project_path)
-    print("✅ HTML generation complete.")
-
-def create_html_chapter_page(chapter, chapters, prefs, project_path):
+        num = ch["number"]
+        page = f"chapter/{num}.html"
+        current_pages.add(page)
+        prev_ch, next_ch = get_neighbours(context.neighbours, ch)
+        signature = hash_value({
+            "shared": shared_signature,
+            "body": hash_source(manifest, os.path.join(project_path, "includes", f"chapter_{num}.html")),
+            "chapter": {key: ch.get(key) for key in ("number", "title", "discussion")},
+            "prev": (prev_ch["number"], prev_ch["title"]) if prev_ch else None,
+            "next": (next_ch["number"], next_ch["title"]) if next_ch else None,
+            "epub": context.has_download(ch, "epub"),
+            "pdf": context.has_download(ch, "pdf"),
+        })
+        output_path = os.path.join(public_dir, "chapter", f"{num}.html")
+        if not force and page_is_current(manifest, page, signature, output_path):
+            summary["skipped"].append(page)
+            continue
+        pending.append((ch, page, signature))
+
+    # Render changed chapter pages, in parallel when requested; results come back in chapter order
+    results = profiler.run_jobs(create_html_chapter_page, [ch for ch, _, _ in pending], (chapters, prefs, project_path, context), jobs,
+                                chapter_number=lambda ch: ch["number"])
+    for (ch, page, signature), (written, error, output) in zip(pending, results):
+        if output:
+            print(output, end="")
+        if error:
+            print(f"❌ Chapter {ch['number']} failed: {error}")
+            summary["failed"].append(page)
+        elif written:
+            record_page(manifest, page, signature)
+            summary["written"].append(page)
+
+    profiler.stage("table of contents")
+    # Split the table of contents into pages when the project asks for it; each page only
+    # depends on its own chapters, so an edit regenerates just the page that lists it
+    toc_pages = split_toc(chapters, context.features)
+    toc_labels = [(toc_page["number"], toc_page["label"]) for toc_page in toc_pages]
+    for i, toc_page in enumerate(toc_pages):
+        page = f"toc/{toc_page['number']}.html"
+        current_pages.add(page)
+        toc_signature = hash_value({
+            "shared": shared_signature,
+            "toc": [(ch["number"], ch["title"]) for ch in toc_page["chapters"]],
+            "label": toc_page["label"],
+            "prev": toc_labels[i - 1] if i > 0 else None,
+            "next": toc_labels[i + 1] if i < len(toc_labels) - 1 else None,
+        })
+        if not force and page_is_current(manifest, page, toc_signature, os.path.join(public_dir, page)):
+            summary["skipped"].append(page)
+        else:
+            create_html_toc_page(toc_pages, i, chapters, prefs, project_path, context)
+            record_page(manifest, page, toc_signature)
+            summary["written"].append(page)
+
+    # A single-page index depends on every chapter's number and title; a split one only on
+    # the newest chapters and the TOC page labels. Both include the optional blurb.
+    current_pages.add("index.html")
+    toc = [(ch["number"], ch["title"]) for ch in (latest_chapters(chapters) if toc_pages else chapters)]
+    index_signature = hash_value({
+        "shared": shared_signature,
+        "toc": toc,
+        "toc_pages": toc_labels,
+        "search": options["search_index"],
+        "feed": bool(options["site_url"].strip()),
+        "blurb": hash_source(manifest, os.path.join(get_includes_path(project_path), "blurb.md")),
+    })
+    if not force and page_is_current(manifest, "index.html", index_signature, os.path.join(public_dir, "index.html")):
+        summary["skipped"].append("index.html")
+    else:
+        create_html_index_page(chapters, prefs, project_path, context, toc_pages)
+        record_page(manifest, "index.html", index_signature)
+        summary["written"].append("index.html")
+
+    profiler.stage("search")
+    # Search index and page; only chapters whose text changed are re-tokenized
+    search_dir = os.path.join(public_dir, "search")
+    if options["search_index"]:
+        use_titles = context.features.get("use_chapter_titles", True)
+        docs = [
+            (ch["number"], format_chapter_heading(ch, use_titles), f"chapter/{ch['number']}.html",
+             os.path.join(project_path, "includes", f"chapter_{ch['number']}.html"))
+            for ch in chapters
+        ]
+        shards_written = update_search_index(project_path, search_dir, docs, manifest, force)
+        if shards_written:
+            print(f"✅ Updated {shards_written} search index file(s).")
+        search_signature = hash_value({"shared": shared_signature})
+        if not force and page_is_current(manifest, "search.html", search_signature, os.path.join(public_dir, "search.html")):
+            summary["skipped"].append("search.html")
+        else:
+            create_html_search_page(prefs, project_path, context)
+            record_page(manifest, "search.html", search_signature)
+            summary["written"].append("search.html")
+    elif manifest.pop("search", None) is not None:
+        shutil.rmtree(search_dir, ignore_errors=True)
+        if os.path.exists(os.path.join(public_dir, "search.html")):
+            os.remove(os.path.join(public_dir, "search.html"))
+        manifest["pages"].pop("search.html", None)
+        print("🗑️ Search disabled; removed the search index and page.")
+
+    profiler.stage("feeds")
+    # Atom feed and sitemaps need absolute URLs, so they are only written once site_url is set
+    site_url = options["site_url"].strip()
+    if site_url:
+        _build_feeds(project_path, prefs, chapters, public_dir, manifest, context, toc_pages,
+                     site_url.rstrip("/") + "/", options["feed_entries"], summary)
+    elif manifest.pop("feeds", None):
+        for page in [p for p in manifest["pages"] if p == "feed.xml" or p.startswith("sitemap")]:
+            if os.path.exists(os.path.join(public_dir, page)):
+                os.remove(os.path.join(public_dir, page))
+            del manifest["pages"][page]
+        print("🗑️ No site URL set; removed the feed and sitemaps.")
+
+    profiler.stage("cleanup")
+    # Remove chapter and TOC pages left over from chapters or TOC pages that no longer exist
+    for page in [p for p in manifest["pages"] if p.startswith(("chapter/", "toc/")) and p not in current_pages]:
+        stale_path = os.path.join(public_dir, page)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+            print(f"🗑️ Removed stale page {stale_path}")
+        del manifest["pages"][page]
+
+    # Compressed siblings for the front-end server's gzip_static/brotli_static
+    if options["precompress"]:
+        profiler.stage("precompress")
+        compressed = precompress_tree(public_dir, jobs, manifest.setdefault("precompress_sources", {}))
+        print(f"✅ Wrote {compressed} precompressed file(s).")
+    elif manifest.get("precompressed"):
+        manifest.pop("precompress_sources", None)
+        removed = remove_compressed_siblings(public_dir)
+        print(f"🗑️ Precompression disabled; removed {removed} compressed file(s).")
+    manifest["precompressed"] = options["precompress"]
+    return summary
+
+def _write_if_changed(manifest, page, content, public_dir, summary):
+    """
+    Writes generated text to public_dir/page unless the same content is already there, leaving
+    the file and its modification time alone (even on forced builds) so conditional requests
+    keep getting 304s.
+    """
+    signature = hash_value(content)
+    output_path = os.path.join(public_dir, page)
+    if page_is_current(manifest, page, signature, output_path):
+        summary["skipped"].append(page)
+        return
+    with replace_file(output_path) as f:
+        f.write(content.encode("utf-8"))
+    record_page(manifest, page, signature)
+    summary["written"].append(page)
+    print(f"✅ Wrote {page}")
+
+def _build_feeds(project_path, prefs, chapters, public_dir, manifest, context, toc_pages, site_url, feed_entries, summary):
+    """
+    Writes feed.xml, an Atom feed of the newest chapters, and a sitemap index (sitemap.xml)
+    over sitemap-<n>.xml shards of at most 50,000 URLs. Entry timestamps are kept in the
+    manifest and only move when a chapter's text, title or summary changes.
+    """
+    use_titles = context.features.get("use_chapter_titles", True)
+    includes_path = get_includes_path(project_path)
+    published = sorted(
+        (ch for ch in chapters if os.path.exists(os.path.join(includes_path, f"chapter_{ch['number']}.html"))),
+        key=lambda ch: ch["number"]
+    )
+
+    dates = {}
+    for ch in published:
+        fragment = os.path.join(includes_path, f"chapter_{ch['number']}.html")
+        summary_path = os.path.join(includes_path, f"chapter_{ch['number']}_summary.md")
+        content_signature = hash_value({
+            "body": hash_source(manifest, fragment),
+            "title": format_chapter_heading(ch, use_titles),
+            "summary": hash_source(manifest, summary_path),
+        })
+        dates[ch["number"]] = update_entry_dates(manifest, str(ch["number"]), content_signature, fragment)
+    manifest["entries"] = {key: entry for key, entry in manifest.get("entries", {}).items() if int(key) in dates}
+
+    entries = []
+    for ch in published[::-1][:feed_entries]:
+        summary_path = os.path.join(includes_path, f"chapter_{ch['number']}_summary.md")
+        entry_summary = ""
+        if os.path.exists(summary_path):
+            with open(summary_path, "r", encoding="utf-8") as f:
+                entry_summary = f.read().strip()
+        entries.append({
+            "title": format_chapter_heading(ch, use_titles),
+            "url": f"{site_url}chapter/{ch['number']}.html",
+            "published": dates[ch["number"]]["published"],
+            "updated": dates[ch["number"]]["updated"],
+            "summary": entry_summary,
+        })
+    _write_if_changed(manifest, "feed.xml", atom_feed(site_url, prefs.get("story_title", ""), prefs.get("story_author", ""), entries),
+                      public_dir, summary)
+
+    urls = [(site_url, None)]
+    urls += [(f"{site_url}toc/{toc_page['number']}.html", None) for toc_page in toc_pages]
+    urls += [(f"{site_url}chapter/{ch['number']}.html", dates[ch["number"]]["updated"]) for ch in published]
+    shards = []
+    current = {"feed.xml", "sitemap.xml"}
+    for i, shard in enumerate(shard_urls(urls), start=1):
+        page = f"sitemap-{i}.xml"
+        current.add(page)
+        _write_if_changed(manifest, page, sitemap(shard), public_dir, summary)
+        shards.append((f"{site_url}{page}", max((lastmod for _, lastmod in shard if lastmod), default=None)))
+    _write_if_changed(manifest, "sitemap.xml", sitemap_index(shards), public_dir, summary)
+
+    for page in [p for p in manifest["pages"] if p.startswith("sitemap-") and p not in current]:
+        if os.path.exists(os.path.join(public_dir, page)):
+            os.remove(os.path.join(public_dir, page))
+        del manifest["pages"][page]
+    manifest["feeds"] = True
+
+def _chapter_page_parts(chapter, chapters, prefs, project_path, context):
+    """Renders chapter.html around the body marker and returns the text before and after it."""
+    chapter_heading = format_chapter_heading(chapter, context.features.get("use_chapter_titles", True))
+    epub_exists = context.has_download(chapter, "epub")
+    pdf_exists = context.has_download(chapter, "pdf")
+
+    variables = _template_vars(prefs, context, chapter, chapters, "../", epub_exists, pdf_exists)
+    page = render_site_template(project_path, "chapter.html", page_title=chapter_heading, body=BODY_MARKER, **variables)
+    if BODY_MARKER not in page:
+        raise ValueError("chapter.html template does not output {{ body }}")
+    page_prefix, _, page_suffix = page.partition(BODY_MARKER)
+    return page_prefix, page_suffix
+
+def render_html_chapter_page(chapter, chapters, prefs, project_path, context=None):
+    """Returns a chapter page as a string, or None if the chapter has no fragment."""
+    if context is None:
+        context = RenderContext(prefs, project_path, chapters)
+    includes_path = os.path.join(project_path, "includes", f"chapter_{chapter['number']}.html")
+    try:
+        with open(includes_path, "r", encoding="utf-8") as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+    page_prefix, page_suffix = _chapter_page_parts(chapter, chapters, prefs, project_path, context)
+    return page_prefix + body + page_suffix
+
+def create_html_chapter_page(chapter, chapters, prefs, project_path, context=None):
     num = chapter["number"]
-    slug = prefs["story_title"].lower().replace(" ", "_")
     includes_path = os.path.join(project_path, "includes", f"chapter_{num}.html")
-    output_path = os.path.join(project_path, "public", "chapter", f"{num}.html")
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if context is None:
+        # Standalone call; build_html creates the context and output directory once per build
+        context = RenderContext(prefs, project_path, chapters)
+        os.makedirs(os.path.join(context.output_dir, "chapter"), exist_ok=True)
+    output_path = os.path.join(context.output_dir, "chapter", f"{num}.html")
 
-    if not os.path.exists(includes_path):
+    try:
+        fragment = open(includes_path, "rb")
+    except FileNotFoundError:
         print(f"⚠️ Chapter HTML file not found: {includes_path}. Skipping chapter {num}.")
-        return
-
-    with open(includes_path, "r", encoding="utf-8") as f:
-        body = f.read()
-
-    chapter_heading = format_chapter_heading(chapter, prefs["display_features"].get("use_chapter_titles", True))
-    epub_name = f"{slug}_chapter_{num}.epub"
-    epub_path = os.path.join(project_path, "download", epub_name)
-    epub_exists = os.path.exists(epub_path)
-    pdf_name = f"{slug}_chapter_{num}.pdf"
-    pdf_path = os.path.join(project_path, "download", pdf_name)
-    pdf_exists = os.path.exists(pdf_path)
-
-    header_block = html_header(prefs, chapter, epub_exists=epub_exists, pdf_exists=pdf_exists, chapter_list=chapters, relative_path_to_root="../")
-    footer_block = html_footer(prefs, chapter=chapter, chapter_list=chapters, project_path=project_path, relative_path_to_root="../")
-
-    html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-  <meta charset="UTF-8" />
-  <title>{chapter_heading}</title>
-  <link rel="stylesheet" href="../styles.css" />
-</head>
-<body>
-{header_block}
-<br>
-{body}
-<br>
-{footer_block}
-</body>
-</html>"""
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html)
+        return None
+
+    with fragment:
+        page_prefix, page_suffix = _chapter_page_parts(chapter, chapters, prefs, project_path, context)
+        if context.minify:
+            # Minifying needs the whole page, so the body is read into memory in this mode
+            body = fragment.read().decode("utf-8")
+            with replace_file(output_path) as f:
+                f.write(minify_html(page_prefix + body + page_suffix).encode("utf-8"))
+        else:
+            # The chapter body is copied straight from the fragment file, so memory use does not
+            # grow with the size of the chapter.
+            with replace_file(output_path) as f:
+                f.write(page_prefix.encode("utf-8"))
+                copy_stream(fragment, f)
+                f.write(page_suffix.encode("utf-8"))
 
     print(f"✅ Chapter {num} written to {output_path}")
+    return output_path
 
-def create_html_index_page(chapters, prefs, project_path):
-    toc = "\n".join([
-        f'<li><a href="chapter/{ch["number"]}.html">{format_chapter_heading(ch, prefs.get("display_features", {}).get("use_chapter_titles", True))}</a></li>'
-        for ch in chapters
-    ])
-
-    header_block = html_header(prefs, relative_path_to_root="")
-    footer_block = html_footer(prefs, project_path=project_path, relative_path_to_root="")
+def render_html_index_page(chapters, prefs, project_path, context=None, toc_pages=None):
+    """Returns the index page as a string."""
+    if context is None:
+        context = RenderContext(prefs, project_path, chapters)
+    if toc_pages is None:
+        toc_pages = split_toc(chapters, context.features)
 
     blurb_html = ""
     display_features = prefs.get("display_features", {})
@@ -356,27 +710,63 @@ def create_html_index_page(chapters, prefs, project_path):
         else:
             print(f"⚠️ 'html_include_blurb' is enabled but blurb file not found: {blurb_filepath}")
 
-    html = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>{prefs["story_title"]} - Table of Contents</title>
-    <link rel="stylesheet" href="styles.css">
-</head>
-<body>
-{header_block}
-<br>
-<main>
-{blurb_html}<center><h3>Table of Contents</h3></center>
-<ul>{toc}</ul>
-</main>
-<br>
-{footer_block}
-</body>
-</html>"""
-
-    out_path = os.path.join(project_path, "public", "index.html")
+    variables = _template_vars(prefs, context, relative_path_to_root="")
+    return render_site_template(
+        project_path, "index.html", chapters=chapters, blurb_html=blurb_html,
+        toc_pages=toc_pages, latest=latest_chapters(chapters) if toc_pages else [],
+        search_enabled=get_publish_options(prefs)["search_index"],
+        feed_enabled=bool(get_publish_options(prefs)["site_url"].strip()), **variables
+    )
+
+def create_html_index_page(chapters, prefs, project_path, context=None, toc_pages=None):
+    if context is None:
+        context = RenderContext(prefs, project_path, chapters)
+    html = render_html_index_page(chapters, prefs, project_path, context, toc_pages)
+
+    out_path = os.path.join(context.output_dir, "index.html")
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    with replace_file(out_path) as f:
+        f.write(_encode_page(html, context))
     print(f"✓ TOC page created: {out_path}")
+
+def render_html_toc_page(toc_pages, page_index, chapters, prefs, project_path, context=None):
+    """Returns one page of a split table of contents as a string."""
+    if context is None:
+        context = RenderContext(prefs, project_path, chapters)
+
+    toc_page = toc_pages[page_index]
+    variables = _template_vars(prefs, context, relative_path_to_root="../")
+    return render_site_template(
+        project_path, "toc.html", toc_page=toc_page,
+        prev_page=toc_pages[page_index - 1] if page_index > 0 else None,
+        next_page=toc_pages[page_index + 1] if page_index < len(toc_pages) - 1 else None,
+        **variables
+    )
+
+def create_html_toc_page(toc_pages, page_index, chapters, prefs, project_path, context=None):
+    """Writes one page of a split table of contents to toc/<number>.html."""
+    if context is None:
+        context = RenderContext(prefs, project_path, chapters)
+    html = render_html_toc_page(toc_pages, page_index, chapters, prefs, project_path, context)
+
+    toc_page = toc_pages[page_index]
+    out_path = os.path.join(context.output_dir, "toc", f"{toc_page['number']}.html")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with replace_file(out_path) as f:
+        f.write(_encode_page(html, context))
+    print(f"✓ TOC page {toc_page['number']} created: {out_path}")
+
+def create_html_search_page(prefs, project_path, context=None):
+    """Writes search.html, which queries the index under search/ in the reader's browser."""
+    if context is None:
+        context = RenderContext(prefs, project_path)
+
+    variables = _template_vars(prefs, context, relative_path_to_root="")
+    html = render_site_template(
+        project_path, "search.html", min_term_length=MIN_TERM_LENGTH, max_results=MAX_SEARCH_RESULTS, **variables
+    )
+
+    out_path = os.path.join(context.output_dir, "search.html")
+    with replace_file(out_path) as f:
+        f.write(_encode_page(html, context))
+    print(f"✓ Search page created: {out_path}")
@@ -24,7 +24,9 @@ def get_html_layout_features(project_path):
         "chapter_nav_bottom": True,
         "social_links": True,
         "copyright": True,
-        "license": True
+        "license": True,
+        "toc_mode": "single",
+        "toc_page_size": 100
     }
     
     # Ensure display_features exists and merge defaults
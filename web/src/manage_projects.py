@@ -3,6 +3,7 @@ import json
 import shutil
 from werkzeug.utils import secure_filename # Import secure_filename
 from core.src.utils import load_prefs, save_prefs
+from core.src.fileio import replace_file
 from web.src.chapter_utils import get_includes_path # Import get_includes_path
 
 # Base directory for projects, assuming this module is in web/src
@@ -89,7 +90,9 @@ def update_project_details(slug, new_title, new_author, new_copyright_year, pdf_
                 if os.path.exists(old_cover_path):
                     os.remove(old_cover_path)
             
-            cover_image_file.save(os.path.join(includes_path, filename_to_save))
+            # Replace rather than overwrite, so a failed upload leaves the old file in place
+            with replace_file(os.path.join(includes_path, filename_to_save)) as f:
+                cover_image_file.save(f)
             prefs['cover_image'] = filename_to_save
         # If no new file is uploaded, retain the existing one, do nothing.
 
@@ -102,7 +105,8 @@ def update_project_details(slug, new_title, new_author, new_copyright_year, pdf_
                 if os.path.exists(old_css_path):
                     os.remove(old_css_path)
 
-            custom_css_file.save(os.path.join(includes_path, filename_to_save))
+            with replace_file(os.path.join(includes_path, filename_to_save)) as f:
+                custom_css_file.save(f)
             prefs['custom_css'] = filename_to_save
         # If no new file is uploaded, retain the existing one, do nothing.
 
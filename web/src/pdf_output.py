@@ -1,22 +1,66 @@
 import os
+import importlib.util
 from pathlib import Path
 import logging
+from core.src.images import cover_variants
+from core.src.profiling import BuildProfile, profile_summary
+from core.src.build_manifest import hash_value
+from core.src.fonts import embedded_fonts, font_face_css
+from core.src.fileio import replace_file
+from web.src.chapter_downloads import build_chapter_downloads
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def build_pdf(project_path, prefs, chapters):
+CHAPTER_PDF_VERSION = 1 # Bump to rebuild every per-chapter PDF after a format change
+
+def get_pdf_css(pdf_prefs):
+    """The stylesheet for the PDF layout preferences."""
+    # Basic CSS
+    css_string = "body { font-family: sans-serif; } h1, h2 { text-align: center; }"
+
+    # Page Size
+    page_size = pdf_prefs.get("page_size", "A4")
+    css_string += f"@page {{ size: {page_size}; }}"
+
+    # Other options can be added here as CSS rules
+    if pdf_prefs.get("add_page_numbers"):
+        css_string += """@page { @bottom-center { content: "Page " counter(page); } }"""
+    return css_string
+
+def get_pdf_stylesheet(project_path, prefs, chapters):
+    """
+    get_pdf_css for the layout preferences, plus @font-face rules for the fonts under
+    includes/fonts/, subset to the text of the chapters, when embed_fonts is on in the PDF
+    layout settings.
+    """
+    css_string = get_pdf_css(prefs.get("pdf_layout", {}))
+    if prefs.get("pdf_display_features", {}).get("embed_fonts", True):
+        # The title page and page numbers are shown too
+        extra_text = [prefs.get("story_title", ""), prefs.get("story_author", ""), "Page 0123456789"]
+        fonts = embedded_fonts(str(project_path), chapters, "exclude_from_pdf", extra_text)
+        css_string += font_face_css(fonts, lambda font: Path(font["path"]).as_uri())
+    return css_string
+
+def build_pdf(project_path, prefs, chapters, profile=False):
+    """
+    Builds the project's PDF in public/downloads/ with WeasyPrint. With profile=True each
+    stage and chapter is timed and measured, and the report is saved to data/build_profile.json.
+    """
     if not prefs.get("pdf_enabled"):
         logging.info("PDF generation is disabled for this project.")
         return None
 
     try:
         from weasyprint import HTML, CSS
+        from weasyprint.text.fonts import FontConfiguration
     except ImportError:
         logging.error("WeasyPrint is not installed. Please see documentation for installation instructions.")
         return None
 
     project_path = Path(project_path)
+    profiler = BuildProfile(str(project_path), "pdf", enabled=profile)
+    profiler.stage("cover")
     pdf_prefs = prefs.get("pdf_layout", {})
 
     slug = prefs.get("story_title", "untitled").lower().replace(" ", "_")
@@ -32,6 +76,10 @@ def build_pdf(project_path, prefs, chapters):
         if cover_image_path_str:
             cover_image_path = project_path / "includes" / cover_image_path_str
             if cover_image_path.exists():
+                # Print-resolution copy instead of the full-size upload, when one can be made
+                variants = cover_variants(project_path, str(cover_image_path))
+                if variants:
+                    cover_image_path = Path(variants["dir"]) / variants["print"]
                 html_content += f'<img src="{cover_image_path.as_uri()}" alt="Cover Image" style="width:100%;height:auto;">'
             else:
                 logging.warning(f"Cover image not found at {cover_image_path}")
@@ -43,6 +91,7 @@ def build_pdf(project_path, prefs, chapters):
         html_content += f'<h2>{prefs.get("story_author", "")}</h2>'
 
     # Chapters
+    profiler.stage("chapters")
     for chapter in chapters:
         if chapter.get("exclude_from_pdf"):
             continue
@@ -55,29 +104,69 @@ def build_pdf(project_path, prefs, chapters):
             logging.warning(f"Chapter content for chapter {num} not found at {chapter_content_path}. Skipping.")
             continue
 
-        body = chapter_content_path.read_text(encoding="utf-8")
-        html_content += f"<h2>{title}</h2><div>{body}</div>"
+        with profiler.chapter(num):
+            body = chapter_content_path.read_text(encoding="utf-8")
+            html_content += f"<h2>{title}</h2><div>{body}</div>"
 
     html_content += "</body></html>"
 
     try:
-        html = HTML(string=html_content, base_url=str(project_path))
+        profiler.stage("parse")
+        # Chapter text refers to images and other files relative to includes/
+        html = HTML(string=html_content, base_url=(project_path / "includes").resolve().as_uri() + "/")
         
-        # Basic CSS
-        css_string = "body { font-family: sans-serif; } h1, h2 { text-align: center; }"
-        
-        # Page Size
-        page_size = pdf_prefs.get("page_size", "A4")
-        css_string += f"@page {{ size: {page_size}; }}"
-
-        # Other options can be added here as CSS rules
-        if pdf_prefs.get("add_page_numbers"):
-            css_string += """@page { @bottom-center { content: "Page " counter(page); } }"""
-
-        css = CSS(string=css_string)
-        html.write_pdf(str(output_path), stylesheets=[css])
+        profiler.stage("fonts")
+        # WeasyPrint only loads @font-face fonts through a FontConfiguration
+        font_config = FontConfiguration()
+        css = CSS(string=get_pdf_stylesheet(project_path, prefs, chapters), font_config=font_config)
+        # Layout and writing are separate steps so a profile can tell them apart
+        profiler.stage("layout")
+        document = html.render(stylesheets=[css], font_config=font_config)
+        profiler.stage("write")
+        document.write_pdf(str(output_path))
         logging.info(f"PDF exported: {output_path}")
+        if profiler.finish():
+            logging.info(profile_summary(profiler.report))
         return str(output_path)
     except Exception as e:
+        profiler.discard()
         logging.error(f"Error generating PDF: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def build_chapter_pdfs(project_path, prefs, chapters, jobs=None, force=False):
+    """
+    Builds a single-chapter PDF for each chapter in download/, the files chapter pages link
+    to when pdf_link is on, with the book's page layout. Chapters are laid out across `jobs`
+    processes, and only chapters that changed are rebuilt.
+    Returns the summary from build_chapter_downloads, or None if PDFs can't be built.
+    """
+    if not prefs.get("pdf_enabled"):
+        logging.info("PDF generation is disabled for this project.")
+        return None
+    # The workers import WeasyPrint themselves
+    if not importlib.util.find_spec("weasyprint"):
+        logging.error("WeasyPrint is not installed. Please see documentation for installation instructions.")
+        return None
+
+    # Fonts are subset to the whole book's text, so every chapter shares them
+    css_string = get_pdf_stylesheet(project_path, prefs, chapters)
+    shared_signature = hash_value({"version": CHAPTER_PDF_VERSION, "css": css_string})
+    return build_chapter_downloads(
+        str(project_path), prefs, chapters, "pdf", "exclude_from_pdf", shared_signature,
+        _render_chapter_pdf, (str(project_path), css_string), jobs, force
+    )
+
+def _render_chapter_pdf(item, project_path, css_string):
+    """Lays out and writes one chapter's PDF."""
+    from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
+    chapter, output_path, _ = item
+    project_path = Path(project_path)
+    title = chapter.get("title", "Untitled Chapter")
+    body = (project_path / "includes" / f"chapter_{chapter['number']}.html").read_text(encoding="utf-8")
+    html_content = f"<html><head><title>{title}</title></head><body><h2>{title}</h2><div>{body}</div></body></html>"
+    # Chapter text refers to images and other files relative to includes/
+    html = HTML(string=html_content, base_url=(project_path / "includes").resolve().as_uri() + "/")
+    font_config = FontConfiguration()
+    with replace_file(output_path) as f:
+        html.write_pdf(f, stylesheets=[CSS(string=css_string, font_config=font_config)], font_config=font_config)
@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import mimetypes
+import threading
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, unquote
+from core.src.utils import load_prefs
+from core.src.toc import split_toc
+from core.src.chapter_nav import published_chapters
+from web.src.chapter_utils import list_chapters, get_includes_path
+from web.src.render_context import RenderContext
+from web.src.site_templates import get_site_environment
+from web.src.html_output import render_html_chapter_page, render_html_index_page, render_html_toc_page
+
+POLL_INTERVAL = 0.5 # Seconds between scans of includes/ and data/
+
+# Polls the server for its version and reloads the page when it changes
+LIVE_RELOAD_SCRIPT = """<script>
+(function () {
+  var version = null;
+  function poll() {
+    fetch("/__preview/version").then(function (r) { return r.text(); }).then(function (v) {
+      if (version !== null && v !== version) location.reload();
+      version = v;
+    }).catch(function () {}).then(function () { setTimeout(poll, 500); });
+  }
+  poll();
+})();
+</script>"""
+
+_CHAPTER_RE = re.compile(r"includes/chapter_(\d+)\.html$")
+
+class PreviewSite:
+    """
+    The project's static site rendered on demand into memory. Pages are rendered the first time
+    they are requested and cached; when a source file changes only the pages that depend on it
+    are dropped, so the next request re-renders just those.
+    """
+    def __init__(self, project_path):
+        self.project_path = project_path
+        self.includes_path = get_includes_path(project_path)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.pages = {}
+        self.reload_project()
+
+    def reload_project(self):
+        """Re-reads prefs, chapters, links and templates; every page depends on these."""
+        self.prefs = load_prefs(self.project_path)
+        # As build_html publishes them: drafts get no page, TOC entry or navigation link
+        self.chapters = published_chapters(list_chapters(self.project_path))
+        get_site_environment(self.project_path, reload=True)
+        self.context = RenderContext(self.prefs, self.project_path, self.chapters)
+        self.toc_pages = split_toc(self.chapters, self.context.features)
+        self.pages = {}
+
+    def invalidate(self, changed_paths):
+        """Drops the cached pages that depend on the changed files and bumps the version."""
+        rel_paths = [os.path.relpath(path, self.project_path).replace(os.sep, "/") for path in changed_paths]
+        with self.lock:
+            if any(rel.startswith(("data/", "includes/templates/")) for rel in rel_paths):
+                self.reload_project()
+            for rel in rel_paths:
+                chapter = _CHAPTER_RE.match(rel)
+                if chapter:
+                    self.pages.pop(f"chapter/{chapter.group(1)}.html", None)
+                elif rel == "includes/blurb.md":
+                    self.pages.pop("index.html", None)
+                # Anything else (stylesheets, images) is served straight from includes/ and
+                # only needs the browser to reload
+            self.version += 1
+
+    def render(self, page):
+        """Returns the rendered page as bytes, or None if there is no such page."""
+        with self.lock:
+            if page in self.pages:
+                return self.pages[page]
+            html = None
+            if page == "index.html":
+                html = render_html_index_page(self.chapters, self.prefs, self.project_path, self.context, self.toc_pages)
+            elif page.startswith("chapter/") and page[len("chapter/"):-len(".html")].isdigit():
+                number = int(page[len("chapter/"):-len(".html")])
+                chapter = next((ch for ch in self.chapters if ch["number"] == number), None)
+                if chapter:
+                    html = render_html_chapter_page(chapter, self.chapters, self.prefs, self.project_path, self.context)
+            elif page.startswith("toc/") and page[len("toc/"):-len(".html")].isdigit():
+                index = int(page[len("toc/"):-len(".html")]) - 1
+                if 0 <= index < len(self.toc_pages):
+                    html = render_html_toc_page(self.toc_pages, index, self.chapters, self.prefs, self.project_path, self.context)
+            if html is None:
+                return None
+            body = html.replace("</body>", LIVE_RELOAD_SCRIPT + "\n</body>", 1).encode("utf-8")
+            self.pages[page] = body
+            return body
+
+    def static_file(self, path):
+        """
+        Maps a site path to the file under includes/ it is published from: assets keep their
+        path, and files referenced from chapter text live under chapter/ on the site.
+        """
+        candidates = [path]
+        if path.startswith("chapter/"):
+            candidates.append(path[len("chapter/"):])
+        for candidate in candidates:
+            full_path = os.path.normpath(os.path.join(self.includes_path, candidate))
+            if full_path.startswith(os.path.normpath(self.includes_path) + os.sep) and os.path.isfile(full_path):
+                return full_path
+        return None
+
+def _snapshot(roots):
+    """Returns {path: (mtime_ns, size)} for every file under the given directories."""
+    files = {}
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def watch(site, stop_event, interval=POLL_INTERVAL):
+    """Polls includes/ and data/ for changes and invalidates the affected pages."""
+    roots = [site.includes_path, os.path.join(site.project_path, "data")]
+    previous = _snapshot(roots)
+    while not stop_event.wait(interval):
+        current = _snapshot(roots)
+        changed = [path for path in set(previous) | set(current) if previous.get(path) != current.get(path)]
+        previous = current
+        if changed:
+            started = time.perf_counter()
+            site.invalidate(changed)
+            names = ", ".join(sorted(os.path.relpath(path, site.project_path) for path in changed)[:5])
+            print(f"🔄 Changed: {names} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+def _make_handler(site):
+    class PreviewHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = unquote(urlsplit(self.path).path).lstrip("/") or "index.html"
+            if path.endswith("/"):
+                path += "index.html"
+
+            if path == "__preview/version":
+                return self._send(str(site.version).encode("utf-8"), "text/plain")
+
+            try:
+                body = site.render(path)
+            except Exception as e:
+                return self._send(f"<pre>Error rendering {escape(path)}: {escape(str(e))}</pre>".encode("utf-8"), "text/html", status=500)
+            if body is not None:
+                return self._send(body, "text/html; charset=utf-8")
+
+            static_path = site.static_file(path)
+            if static_path:
+                with open(static_path, "rb") as f:
+                    data = f.read()
+                return self._send(data, mimetypes.guess_type(static_path)[0] or "application/octet-stream")
+            self._send(b"Not found", "text/plain", status=404)
+
+        def _send(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store") # Always show the latest render
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Keep the console for change notifications
+
+    return PreviewHandler
+
+def serve(project_path, host="127.0.0.1", port=8000):
+    """
+    Serves a live preview of the project's static site until interrupted. Nothing is written
+    to public/: pages are rendered in memory and re-rendered when their sources change, and
+    open pages reload themselves.
+    """
+    site = PreviewSite(project_path)
+    stop_event = threading.Event()
+    watcher = threading.Thread(target=watch, args=(site, stop_event), daemon=True)
+    watcher.start()
+
+    server = ThreadingHTTPServer((host, port), _make_handler(site))
+    print(f"👀 Previewing {site.prefs.get('story_title', project_path)} at http://{host}:{port}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
@@ -0,0 +1,62 @@
+from core.src.utils import load_prefs, save_prefs
+from pathlib import Path
+
+DEFAULT_PUBLISH_OPTIONS = {
+    "precompress": False,
+    "search_index": False,
+    "minify": False,
+    "site_url": "",
+    "feed_entries": 20,
+    "atomic_publish": False,
+    "keep_releases": 3
+}
+
+def get_publish_options(prefs):
+    """
+    Returns the static site publishing options from a loaded prefs dict,
+    filling in defaults for any that are not set.
+    """
+    options = dict(DEFAULT_PUBLISH_OPTIONS)
+    options.update(prefs.get("publish_options", {}))
+    return options
+
+def update_publish_options(project_path, form_data):
+    """
+    Updates the publishing options from the Publish HTML form and saves them to project preferences.
+    """
+    project_path = Path(project_path)
+    prefs = load_prefs(project_path)
+
+    options = prefs.setdefault("publish_options", {})
+
+    # List of all expected publishing option keys (checkboxes)
+    checkbox_keys = [
+        "precompress", "atomic_publish", "search_index", "minify"
+    ]
+
+    updated = False
+    for key in checkbox_keys:
+        new_value = form_data.get(key) == 'on'
+        if options.get(key) != new_value:
+            options[key] = new_value
+            updated = True
+
+    # Handle the number inputs separately
+    for key in ("keep_releases", "feed_entries"):
+        try:
+            value = max(1, int(form_data.get(key, "")))
+        except ValueError:
+            value = None
+        if value and options.get(key) != value:
+            options[key] = value
+            updated = True
+
+    # Base URL for the feed and sitemaps; they are not generated while it is empty
+    site_url = form_data.get("site_url")
+    if site_url is not None and options.get("site_url", "") != site_url.strip():
+        options["site_url"] = site_url.strip()
+        updated = True
+
+    if updated:
+        save_prefs(project_path, prefs)
+    return updated
@@ -0,0 +1,104 @@
+import os
+import json
+from core.src.social_utils import load_links
+from core.src.chapter_nav import build_neighbour_index
+from web.src.site_templates import render_site_template
+
+LICENSE_URLS = {
+    "CC-BY-NC-SA-4.0": "https://creativecommons.org/licenses/by-nc-sa/4.0/"
+    # Add more codes here as needed
+}
+
+class RenderContext:
+    """
+    The parts of the static site header and footer that are the same on every page,
+    computed once per build_html run instead of once per chapter. The share, follow,
+    copyright and license blocks are rendered from their site templates here.
+    """
+    def __init__(self, prefs, project_path, chapters=None, output_dir=None):
+        self.prefs = prefs
+        self.project_path = project_path
+        # Where pages are written: public/, or the staging release during an atomic publish
+        self.output_dir = output_dir or (os.path.join(project_path, "public") if project_path else None)
+        self.features = prefs.get("display_features", {})
+        self.story_title = prefs.get("story_title", "")
+        self.slug = self.story_title.lower().replace(" ", "_")
+
+        try:
+            self.share_links, self.follow_links, self.handles = load_links(project_path) if project_path else ([], {}, {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.share_links, self.follow_links, self.handles = [], {}, {}
+
+        self.follow_urls = self._resolve_follow_urls()
+        self.share_block = self._share_block()
+        self.follow_block = self._follow_block()
+        self.copyright_line = self._render_block("copyright.html", copyright=prefs.get("copyright", ""), author=prefs.get("story_author", ""))
+        self.license_block = self._license_block()
+        self.downloads = self._scan_downloads()
+        self.neighbours = build_neighbour_index(chapters or [])
+        # Resized cover variants (see core.src.images), set by build_html once they are published
+        self.cover = None
+        # Whether pages are minified (the minify publish option), set by build_html
+        self.minify = False
+
+    def _resolve_follow_urls(self):
+        """Returns (label, url) pairs for every follow link that has a handle."""
+        urls = []
+        for platform in self.follow_links:
+            handle_value = self.handles.get(platform) # Get handle from handles dict
+            if not handle_value:
+                continue
+            if platform == "github":
+                url = f"https://github.com/{handle_value}"
+            elif platform == "x":
+                url = f"https://x.com/{handle_value}"
+            elif platform == "bluesky":
+                url = f"https://bsky.app/profile/{handle_value}.bsky.social"
+            elif platform == "mastodon":
+                url = handle_value  # Full URL expected
+            else:
+                url = f"https://www.instagram.com/{handle_value}" # Default to Instagram if no specific URL
+            urls.append((platform.title(), url))
+        return urls
+
+    def _render_block(self, name, **variables):
+        # Blocks are inserted on their own line in the footer template, so drop the trailing newline
+        return render_site_template(self.project_path, name, **variables).rstrip("\n")
+
+    def _share_block(self):
+        if not self.share_links:
+            return ""
+        return self._render_block("share_links.html", share_links=self.share_links, story_title=self.story_title)
+
+    def _follow_block(self):
+        if not self.follow_links:
+            return ""
+        return self._render_block("follow_links.html", follow_urls=self.follow_urls)
+
+    def _license_block(self):
+        raw_license_data = self.prefs.get("license", "")
+        license_code_id = ""
+        license_url_from_pref = None
+
+        if isinstance(raw_license_data, dict):
+            license_code_id = raw_license_data.get("id", "")
+            license_url_from_pref = raw_license_data.get("url")
+        elif isinstance(raw_license_data, str):
+            license_code_id = raw_license_data
+
+        license_url = license_url_from_pref if license_url_from_pref else LICENSE_URLS.get(license_code_id, "#")
+        return self._render_block("license.html", license_id=license_code_id, license_url=license_url)
+
+    def _scan_downloads(self):
+        """A single snapshot of the file names in the project's download directory."""
+        if not self.project_path:
+            return frozenset()
+        try:
+            with os.scandir(os.path.join(self.project_path, "download")) as entries:
+                return frozenset(entry.name for entry in entries if entry.is_file())
+        except FileNotFoundError:
+            return frozenset()
+
+    def has_download(self, chapter, extension):
+        """True if the per-chapter download (epub or pdf) exists for the chapter."""
+        return f"{self.slug}_chapter_{chapter['number']}.{extension}" in self.downloads
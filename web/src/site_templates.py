@@ -0,0 +1,68 @@
+import os
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from core.src.build_manifest import hash_source
+from web.src.chapter_utils import format_chapter_heading
+
+# Default templates for the published static site (the Flask UI templates live in web/templates)
+SITE_TEMPLATES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "site_templates"))
+
+# Rendered in place of {{ body }} in chapter.html so the page can be split around the chapter
+# fragment, which is then streamed from disk rather than passed through the template.
+BODY_MARKER = "\x00publine:chapter-body\x00"
+
+_environments = {}
+
+def get_theme_path(project_path):
+    """Project-specific template overrides; any file here replaces the default of the same name."""
+    return os.path.join(project_path, "includes", "templates")
+
+def get_site_environment(project_path=None, reload=False):
+    """
+    Returns the Jinja2 environment used to render a project's static site.
+    The environment is created once per process (or again when reload is True, which
+    build_html does at the start of every build) and templates are compiled once and
+    reused for every page. Compiled bytecode is cached under the project's cache/jinja/.
+    """
+    key = os.path.abspath(project_path) if project_path else None
+    env = _environments.get(key)
+    if env is not None and not reload:
+        return env
+
+    search_path = [SITE_TEMPLATES_DIR]
+    bytecode_cache = None
+    if project_path:
+        search_path.insert(0, get_theme_path(project_path))
+        cache_dir = os.path.join(project_path, "cache", "jinja")
+        os.makedirs(cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    env = Environment(
+        loader=FileSystemLoader(search_path),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False, # Templates are fixed for the duration of a build
+        autoescape=False, # Titles and fragments are author-supplied HTML
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True
+    )
+    env.globals["chapter_heading"] = format_chapter_heading
+    _environments[key] = env
+    return env
+
+def render_site_template(project_path, name, **variables):
+    return get_site_environment(project_path).get_template(name).render(**variables)
+
+def templates_signature(project_path, manifest):
+    """
+    Maps each site template name to the hash of the file that will be used for it,
+    taking project overrides into account, so theme edits invalidate the build manifest.
+    """
+    signature = {}
+    for directory in (SITE_TEMPLATES_DIR, get_theme_path(project_path)):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.endswith(".html") and os.path.isfile(path):
+                signature[name] = hash_source(manifest, path)
+    return signature